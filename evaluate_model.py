@@ -14,6 +14,11 @@ Run this script after training your model to get:
 
 Usage:
     python evaluate_model.py
+    python evaluate_model.py --model isl_model_advanced.h5
+    python evaluate_model.py --threads 4 --batch-size 16384
+    python evaluate_model.py --cm-render annotated   # paper-quality heatmap
+    python evaluate_model.py --cm-render html        # interactive SVG in HTML
+    python evaluate_model.py --no-cache              # ignore stored predictions
 
 Requirements:
     pip install tensorflow numpy pandas scikit-learn matplotlib seaborn
@@ -25,37 +30,54 @@ import pandas as pd
 import tensorflow as tf
 from tensorflow import keras
 import matplotlib.pyplot as plt
-import seaborn as sns
-from sklearn.metrics import (
-    classification_report,
-    confusion_matrix,
-    accuracy_score,
-    precision_score,
-    recall_score,
-    f1_score,
-    precision_recall_fscore_support
-)
+from sklearn.metrics import classification_report
 from sklearn.model_selection import train_test_split
 import json
+import html
+import hashlib
 from datetime import datetime
 
+from landmark_dataset import dataset_exists, load_dataset as load_binary_dataset, remap_labels, csv_is_newer
+from model_layers import CUSTOM_OBJECTS
+
 # ============================================================================
 # CONFIGURATION - Update these paths to match your project
 # ============================================================================
 
 CONFIG = {
-    # Path to your trained model (.h5 or .keras or SavedModel directory)
+    # Path to your trained model (.tflite, .h5, .keras or SavedModel directory)
     "model_path": "isl_model_advanced.tflite",
     
+    # Samples per inference call (the TFLite input tensor is resized to this)
+    "batch_size": 8192,
+    
+    # TFLite interpreter threads (None = let TFLite decide)
+    "num_threads": None,
+    
     # Path to your landmark CSV dataset
     "csv_path": "landmark_dataset_with_orientation.csv",
     
+    # Path to the binary (.npy) landmark dataset - used instead of the CSV if present
+    "dataset_path": "landmark_dataset_with_orientation",
+    
     # Path to training history JSON (if saved during training)
     "history_path": "model/training_history.json",
     
     # Output directory for evaluation results
     "output_dir": "evaluation_results",
     
+    # Confusion matrix rendering:
+    #   'fast'      - raw matrix via imshow, no per-cell text (default, cheap for CI)
+    #   'annotated' - 300 dpi seaborn heatmap with per-cell counts (for the paper)
+    #   'html'      - interactive SVG (hover a cell for its counts) in an HTML file
+    #   'none'      - skip the plot, the matrix CSV is still saved
+    "cm_render": "fast",
+    
+    # Stored predictions, keyed by a fingerprint of the model bytes, dataset
+    # bytes and split config - unchanged inputs only regenerate the reports
+    "cache_dir": "evaluation_results/cache",
+    "use_cache": True,
+    
     # Class names (A-Z and 1-9)
     "class_names": list("ABCDEFGHIJKLMNOPQRSTUVWXYZ") + [str(i) for i in range(1, 10)],
     
@@ -82,33 +104,56 @@ def create_output_dir():
         os.makedirs(CONFIG["output_dir"])
     print(f"✓ Output directory: {CONFIG['output_dir']}")
 
+def dataset_source(verbose=False):
+    """
+    Path of the dataset to evaluate on: the binary dataset unless the CSV is
+    newer (a later CSV-only extraction left a stale binary copy). None if neither exists.
+    """
+    if csv_is_newer(CONFIG["csv_path"], CONFIG["dataset_path"]):
+        if verbose:
+            print(f"⚠️  {CONFIG['csv_path']} is newer than {CONFIG['dataset_path']}/, using the CSV")
+        return CONFIG["csv_path"]
+    if dataset_exists(CONFIG["dataset_path"]):
+        return CONFIG["dataset_path"]
+    if os.path.exists(CONFIG["csv_path"]):
+        return CONFIG["csv_path"]
+    return None
+
 def load_dataset():
-    """Load and preprocess the landmark dataset from CSV."""
+    """Load and preprocess the landmark dataset (binary .npy or CSV)."""
     print("\n" + "="*60)
     print("LOADING DATASET")
     print("="*60)
     
-    if not os.path.exists(CONFIG["csv_path"]):
-        print(f"✗ CSV file not found: {CONFIG['csv_path']}")
-        print("  Please update CONFIG['csv_path'] with correct path")
+    source = dataset_source(verbose=True)
+    if source == CONFIG["dataset_path"]:
+        # Memory-mapped binary dataset: no text parsing
+        X, y, meta = load_binary_dataset(CONFIG["dataset_path"])
+        print(f"✓ Loaded binary dataset with {len(X)} samples")
+        y = remap_labels(y, [str(label).upper() for label in meta['labels']], CONFIG["class_names"])
+        df = None
+    elif source == CONFIG["csv_path"]:
+        df = pd.read_csv(CONFIG["csv_path"])
+        print(f"✓ Loaded CSV with {len(df)} samples")
+        print(f"  Columns: {list(df.columns[:5])}... (total: {len(df.columns)})")
+        
+        # Assume last column is the label
+        X = df.iloc[:, :-1].values
+        y_labels = df.iloc[:, -1].values
+        
+        # Convert labels to indices
+        label_to_idx = {label: idx for idx, label in enumerate(CONFIG["class_names"])}
+        y = np.array([label_to_idx.get(str(label).upper(), -1) for label in y_labels])
+    else:
+        print(f"✗ Dataset not found: {CONFIG['dataset_path']}/ or {CONFIG['csv_path']}")
+        print("  Please update CONFIG['dataset_path'] or CONFIG['csv_path'] with correct path")
         return None, None, None
     
-    df = pd.read_csv(CONFIG["csv_path"])
-    print(f"✓ Loaded CSV with {len(df)} samples")
-    print(f"  Columns: {list(df.columns[:5])}... (total: {len(df.columns)})")
-    
-    # Assume last column is the label
-    X = df.iloc[:, :-1].values
-    y_labels = df.iloc[:, -1].values
-    
-    # Convert labels to indices
-    label_to_idx = {label: idx for idx, label in enumerate(CONFIG["class_names"])}
-    y = np.array([label_to_idx.get(str(label).upper(), -1) for label in y_labels])
-    
     # Filter out invalid labels
     valid_mask = y >= 0
-    X = X[valid_mask]
-    y = y[valid_mask]
+    if not np.all(valid_mask):
+        X = X[valid_mask]
+        y = y[valid_mask]
     
     print(f"✓ Valid samples: {len(X)}")
     print(f"  Feature dimensions: {X.shape[1]}")
@@ -123,25 +168,89 @@ def load_dataset():
     
     return X, y, df
 
-def load_model():
-    """Load the trained model."""
+# ============================================================================
+# MODEL BACKENDS
+# ============================================================================
+
+class KerasBackend:
+    """Evaluate a Keras model (.h5, .keras or SavedModel)."""
+    
+    def __init__(self, path, batch_size=8192):
+        # Advanced models need their custom layers to deserialize
+        self.model = keras.models.load_model(path, custom_objects=CUSTOM_OBJECTS, compile=False)
+        self.batch_size = batch_size
+        self.name = "Keras"
+    
+    def count_params(self):
+        return self.model.count_params()
+    
+    def predict(self, X):
+        return self.model.predict(np.asarray(X, dtype=np.float32), batch_size=self.batch_size, verbose=0)
+
+
+class TFLiteBackend:
+    """
+    Evaluate the shipped .tflite artifact.
+    
+    The input tensor is resized to batch_size, so a whole split runs in a
+    few invokes instead of one per sample.
+    """
+    
+    def __init__(self, path, batch_size=8192, num_threads=None):
+        self.interpreter = tf.lite.Interpreter(model_path=path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self.input_details = self.interpreter.get_input_details()[0]
+        self.output_index = self.interpreter.get_output_details()[0]['index']
+        self.batch_size = batch_size
+        self.current_size = int(self.input_details['shape'][0])
+        self.name = "TFLite"
+    
+    def count_params(self):
+        # The public interpreter API can't tell weights from activations reliably
+        return None
+    
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        input_index = self.input_details['index']
+        
+        outputs = []
+        for start in range(0, len(X), self.batch_size):
+            batch = X[start:start + self.batch_size]
+            if len(batch) != self.current_size:
+                self.interpreter.resize_tensor_input(input_index, [len(batch), X.shape[1]])
+                self.interpreter.allocate_tensors()
+                self.current_size = len(batch)
+            self.interpreter.set_tensor(input_index, batch)
+            self.interpreter.invoke()
+            outputs.append(self.interpreter.get_tensor(self.output_index).copy())
+        
+        return np.concatenate(outputs)
+
+
+def load_model(model_path=None):
+    """Load the trained model behind a backend with a batched predict()."""
     print("\n" + "="*60)
     print("LOADING MODEL")
     print("="*60)
     
-    if not os.path.exists(CONFIG["model_path"]):
-        print(f"✗ Model file not found: {CONFIG['model_path']}")
+    model_path = model_path or CONFIG["model_path"]
+    if not os.path.exists(model_path):
+        print(f"✗ Model file not found: {model_path}")
         print("  Please update CONFIG['model_path'] with correct path")
         return None
     
-    model = keras.models.load_model(CONFIG["model_path"])
-    print(f"✓ Model loaded from: {CONFIG['model_path']}")
+    if model_path.endswith('.tflite'):
+        model = TFLiteBackend(model_path, CONFIG["batch_size"], CONFIG["num_threads"])
+    else:
+        model = KerasBackend(model_path, CONFIG["batch_size"])
+    print(f"✓ {model.name} model loaded from: {model_path}")
     
     # Model summary
     print(f"\n  Model Summary:")
     total_params = model.count_params()
-    print(f"    Total parameters: {total_params:,}")
-    print(f"    Model size: ~{total_params * 4 / 1024:.1f} KB (float32)")
+    print(f"    Total parameters: {total_params:,}" if total_params is not None
+          else "    Total parameters: n/a")
+    print(f"    Model size: ~{os.path.getsize(model_path) / 1024:.1f} KB on disk")
     
     return model
 
@@ -178,8 +287,47 @@ def split_data(X, y):
 # EVALUATION FUNCTIONS
 # ============================================================================
 
+def confusion_counts(y_true, y_pred, n_classes=None):
+    """Confusion matrix over all classes in one bincount (rows = true, cols = predicted)."""
+    n_classes = n_classes or len(CONFIG["class_names"])
+    flat = np.asarray(y_true, dtype=np.int64) * n_classes + np.asarray(y_pred, dtype=np.int64)
+    return np.bincount(flat, minlength=n_classes * n_classes).reshape(n_classes, n_classes)
+
+def per_class_metrics(cm):
+    """Per-class precision, recall, F1 and support from a confusion matrix (zero_division=0)."""
+    tp = np.diag(cm).astype(np.float64)
+    support = cm.sum(axis=1)
+    predicted = cm.sum(axis=0)
+    
+    precision = np.divide(tp, predicted, out=np.zeros_like(tp), where=predicted > 0)
+    recall = np.divide(tp, support, out=np.zeros_like(tp), where=support > 0)
+    denom = precision + recall
+    f1 = np.divide(2 * precision * recall, denom, out=np.zeros_like(tp), where=denom > 0)
+    
+    return precision, recall, f1, support
+
+def metrics_from_confusion(cm):
+    """Accuracy and macro precision/recall/F1 (in %) from a confusion matrix."""
+    precision, recall, f1, support = per_class_metrics(cm)
+    
+    # Macro averages cover the classes that occur in y_true or y_pred, as in sklearn
+    present = (support + cm.sum(axis=0)) > 0
+    total = cm.sum()
+    
+    return {
+        "accuracy": float(np.trace(cm) / total * 100) if total else 0.0,
+        "precision": float(precision[present].mean() * 100) if present.any() else 0.0,
+        "recall": float(recall[present].mean() * 100) if present.any() else 0.0,
+        "f1_score": float(f1[present].mean() * 100) if present.any() else 0.0,
+    }
+
 def evaluate_model(model, X_train, X_val, X_test, y_train, y_val, y_test):
-    """Evaluate model on all datasets and compute metrics."""
+    """
+    Evaluate model on all datasets and compute metrics.
+    
+    The splits are predicted in a single pass over their concatenation and
+    sliced back by offset; every metric comes from one confusion matrix per split.
+    """
     print("\n" + "="*60)
     print("EVALUATING MODEL")
     print("="*60)
@@ -192,45 +340,95 @@ def evaluate_model(model, X_train, X_val, X_test, y_train, y_val, y_test):
         ("Test", X_test, y_test)
     ]
     
-    for name, X, y in datasets:
-        print(f"\n  Evaluating on {name} set...")
-        
-        # Get predictions
-        y_pred_proba = model.predict(X, verbose=0)
-        y_pred = np.argmax(y_pred_proba, axis=1)
-        
-        # Calculate metrics
-        accuracy = accuracy_score(y, y_pred) * 100
-        precision = precision_score(y, y_pred, average='macro', zero_division=0) * 100
-        recall = recall_score(y, y_pred, average='macro', zero_division=0) * 100
-        f1 = f1_score(y, y_pred, average='macro', zero_division=0) * 100
-        
-        results[name.lower()] = {
-            "accuracy": accuracy,
-            "precision": precision,
-            "recall": recall,
-            "f1_score": f1,
-            "y_true": y,
-            "y_pred": y_pred,
-            "y_pred_proba": y_pred_proba
-        }
-        
-        print(f"    ✓ {name} Accuracy:  {accuracy:.2f}%")
-        print(f"    ✓ {name} Precision: {precision:.2f}%")
-        print(f"    ✓ {name} Recall:    {recall:.2f}%")
-        print(f"    ✓ {name} F1-Score:  {f1:.2f}%")
+    # One inference pass over all splits
+    print(f"\n  Predicting {sum(len(X) for _, X, _ in datasets):,} samples in one pass...")
+    all_proba = model.predict(np.concatenate([X for _, X, _ in datasets]))
+    offsets = np.cumsum([0] + [len(X) for _, X, _ in datasets])
+    
+    for (name, _, y), start, end in zip(datasets, offsets[:-1], offsets[1:]):
+        results[name.lower()] = split_results(name, y, all_proba[start:end])
     
     return results
 
-def generate_confusion_matrix(y_true, y_pred, save_path=None):
-    """Generate and plot confusion matrix."""
+def split_results(name, y, y_pred_proba):
+    """Metrics for one split from its labels and predicted probabilities."""
+    print(f"\n  Evaluating on {name} set...")
+    
+    y_pred = np.argmax(y_pred_proba, axis=1)
+    
+    # All metrics from the split's confusion matrix
+    cm = confusion_counts(y, y_pred)
+    metrics = metrics_from_confusion(cm)
+    
+    print(f"    ✓ {name} Accuracy:  {metrics['accuracy']:.2f}%")
+    print(f"    ✓ {name} Precision: {metrics['precision']:.2f}%")
+    print(f"    ✓ {name} Recall:    {metrics['recall']:.2f}%")
+    print(f"    ✓ {name} F1-Score:  {metrics['f1_score']:.2f}%")
+    
+    return {
+        **metrics,
+        "y_true": y,
+        "y_pred": y_pred,
+        "y_pred_proba": y_pred_proba,
+        "confusion_matrix": cm
+    }
+
+def generate_confusion_matrix(y_true, y_pred, save_path=None, cm=None, render=None):
+    """
+    Generate and plot confusion matrix (pass cm to reuse an already computed one).
+    
+    render picks the output (see CONFIG['cm_render']); 'html' writes next to
+    save_path with an .html extension.
+    """
     print("\n" + "="*60)
     print("GENERATING CONFUSION MATRIX")
     print("="*60)
     
-    cm = confusion_matrix(y_true, y_pred)
+    if cm is None:
+        cm = confusion_counts(y_true, y_pred)
+    render = render or CONFIG["cm_render"]
+    
+    if not save_path or render == 'none':
+        return cm
+    
+    if render == 'annotated':
+        render_annotated_confusion_matrix(cm, save_path)
+    elif render == 'html':
+        save_path = os.path.splitext(save_path)[0] + '.html'
+        export_confusion_matrix_html(cm, save_path)
+    else:
+        render_fast_confusion_matrix(cm, save_path)
+    print(f"✓ Confusion matrix saved to: {save_path}")
+    
+    return cm
+
+def _confusion_matrix_title(cm):
+    return f'Confusion Matrix - {len(cm)} Class ISL Sign Classification'
+
+def render_fast_confusion_matrix(cm, save_path, max_tick_labels=60):
+    """Draw the raw matrix with imshow: no per-cell text, figure size and dpi kept small."""
+    size = min(12, 4 + len(cm) * 0.1)
+    fig, ax = plt.subplots(figsize=(size, size))
+    image = ax.imshow(cm, cmap='Blues', interpolation='nearest')
+    fig.colorbar(image, ax=ax, fraction=0.046, pad=0.04)
+    
+    # Tick labels only while they stay legible
+    if len(cm) <= max_tick_labels:
+        ax.set_xticks(range(len(cm)))
+        ax.set_yticks(range(len(cm)))
+        ax.set_xticklabels(CONFIG["class_names"][:len(cm)], fontsize=7)
+        ax.set_yticklabels(CONFIG["class_names"][:len(cm)], fontsize=7)
+    
+    ax.set_title(_confusion_matrix_title(cm), fontsize=12)
+    ax.set_xlabel('Predicted Label')
+    ax.set_ylabel('True Label')
+    fig.savefig(save_path, dpi=100, bbox_inches='tight')
+    plt.close(fig)
+
+def render_annotated_confusion_matrix(cm, save_path):
+    """Paper-quality seaborn heatmap with a count in every cell (slow for large label sets)."""
+    import seaborn as sns
     
-    # Plot confusion matrix
     plt.figure(figsize=(16, 14))
     sns.heatmap(
         cm, 
@@ -241,28 +439,67 @@ def generate_confusion_matrix(y_true, y_pred, save_path=None):
         yticklabels=CONFIG["class_names"],
         annot_kws={"size": 8}
     )
-    plt.title('Confusion Matrix - 35 Class ISL Sign Classification', fontsize=14)
+    plt.title(_confusion_matrix_title(cm), fontsize=14)
     plt.xlabel('Predicted Label', fontsize=12)
     plt.ylabel('True Label', fontsize=12)
     plt.tight_layout()
-    
-    if save_path:
-        plt.savefig(save_path, dpi=300, bbox_inches='tight')
-        print(f"✓ Confusion matrix saved to: {save_path}")
-    
+    plt.savefig(save_path, dpi=300, bbox_inches='tight')
     plt.close()
-    
-    return cm
 
-def analyze_per_class_performance(y_true, y_pred):
+def export_confusion_matrix_html(cm, save_path, cell=14):
+    """
+    Write the matrix as an SVG inside a standalone HTML page.
+    
+    Only non-zero cells are emitted; hovering a cell shows the true/predicted
+    class, the count and the share of the true class. No matplotlib involved.
+    """
+    names = [html.escape(str(name)) for name in CONFIG["class_names"][:len(cm)]]
+    n = len(cm)
+    margin = 60
+    extent = margin + n * cell
+    
+    row_totals = np.maximum(cm.sum(axis=1), 1)
+    peak = max(int(cm.max()), 1)
+    rows, cols = np.nonzero(cm)
+    
+    parts = [
+        '<!DOCTYPE html>',
+        '<html><head><meta charset="utf-8">',
+        f'<title>{_confusion_matrix_title(cm)}</title>',
+        '<style>body{font-family:sans-serif} rect.c:hover{stroke:#d62728;stroke-width:2}</style>',
+        '</head><body>',
+        f'<h2>{_confusion_matrix_title(cm)}</h2>',
+        '<p>Rows: true label, columns: predicted label. Hover a cell for details.</p>',
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{extent}" height="{extent}" font-size="{cell * 0.7:.0f}">',
+        f'<rect x="{margin}" y="{margin}" width="{n * cell}" height="{n * cell}" fill="#f7fbff" stroke="#ccc"/>',
+    ]
+    for i, name in enumerate(names):
+        offset = margin + i * cell + cell * 0.75
+        parts.append(f'<text x="{margin - 4}" y="{offset:.1f}" text-anchor="end">{name}</text>')
+        parts.append(f'<text x="{offset:.1f}" y="{margin - 4}" transform="rotate(-90 {offset:.1f} {margin - 4})">{name}</text>')
+    for i, j in zip(rows, cols):
+        count = int(cm[i, j])
+        # Blues-like ramp: light for few samples, dark for many
+        shade = 1 - (count / peak) ** 0.5
+        color = f'rgb({int(8 + 239 * shade)},{int(48 + 203 * shade)},{int(107 + 148 * shade)})'
+        parts.append(
+            f'<rect class="c" x="{margin + j * cell}" y="{margin + i * cell}" width="{cell}" height="{cell}" fill="{color}">'
+            f'<title>True {names[i]} → Predicted {names[j]}: {count} ({count / row_totals[i] * 100:.1f}%)</title></rect>'
+        )
+    parts.append('</svg></body></html>')
+    
+    with open(save_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(parts))
+
+def analyze_per_class_performance(y_true, y_pred, cm=None):
     """Analyze per-class precision, recall, and F1-score."""
     print("\n" + "="*60)
     print("PER-CLASS PERFORMANCE ANALYSIS")
     print("="*60)
     
-    precision, recall, f1, support = precision_recall_fscore_support(
-        y_true, y_pred, average=None, zero_division=0
-    )
+    if cm is None:
+        cm = confusion_counts(y_true, y_pred)
+    precision, recall, f1, support = per_class_metrics(cm)
     
     # Create DataFrame for easy viewing
     class_metrics = pd.DataFrame({
@@ -277,70 +514,71 @@ def analyze_per_class_performance(y_true, y_pred):
     class_metrics_sorted = class_metrics.sort_values('F1-Score', ascending=False)
     
     print("\n  Top 10 Best Performing Classes:")
-    print("  " + "-"*55)
-    print(f"  {'Class':<8} {'Precision':>10} {'Recall':>10} {'F1-Score':>10} {'Support':>8}")
-    print("  " + "-"*55)
-    for _, row in class_metrics_sorted.head(10).iterrows():
-        print(f"  {row['Class']:<8} {row['Precision']:>10.1f}% {row['Recall']:>10.1f}% {row['F1-Score']:>10.1f}% {int(row['Support']):>8}")
+    print_class_table(class_metrics_sorted.head(10))
     
     print("\n  Bottom 10 Worst Performing Classes:")
+    print_class_table(class_metrics_sorted.tail(10))
+    
+    return class_metrics
+
+def print_class_table(class_metrics):
+    """Print per-class rows, reading the DataFrame column-wise rather than row by row."""
     print("  " + "-"*55)
     print(f"  {'Class':<8} {'Precision':>10} {'Recall':>10} {'F1-Score':>10} {'Support':>8}")
     print("  " + "-"*55)
-    for _, row in class_metrics_sorted.tail(10).iterrows():
-        print(f"  {row['Class']:<8} {row['Precision']:>10.1f}% {row['Recall']:>10.1f}% {row['F1-Score']:>10.1f}% {int(row['Support']):>8}")
-    
-    return class_metrics
+    for name, precision, recall, f1, support in zip(
+        class_metrics['Class'], class_metrics['Precision'], class_metrics['Recall'],
+        class_metrics['F1-Score'], class_metrics['Support']
+    ):
+        print(f"  {name:<8} {precision:>10.1f}% {recall:>10.1f}% {f1:>10.1f}% {int(support):>8}")
 
-def analyze_confusion_pairs(cm):
-    """Identify the most confused sign pairs."""
+def analyze_confusion_pairs(cm, class_names=None):
+    """
+    Identify the most confused sign pairs.
+    
+    Computed with array ops on the confusion matrix: directional confusion
+    rates are folded into bidirectional pairs with cm + cm.T over the upper
+    triangle, so the cost stays small for label sets with hundreds of classes.
+    """
     print("\n" + "="*60)
     print("CONFUSION PAIR ANALYSIS")
     print("="*60)
     
-    confusion_pairs = []
-    n_classes = len(CONFIG["class_names"])
-    
-    for i in range(n_classes):
-        for j in range(n_classes):
-            if i != j and cm[i, j] > 0:
-                # Confusion rate: how often class i is misclassified as class j
-                total_i = cm[i, :].sum()
-                if total_i > 0:
-                    confusion_rate = cm[i, j] / total_i * 100
-                    confusion_pairs.append({
-                        'From': CONFIG["class_names"][i],
-                        'To': CONFIG["class_names"][j],
-                        'Count': cm[i, j],
-                        'Rate': confusion_rate
-                    })
-    
-    # Sort by confusion count
-    confusion_df = pd.DataFrame(confusion_pairs)
-    confusion_df = confusion_df.sort_values('Count', ascending=False)
-    
-    # Aggregate bidirectional confusion
-    bidirectional = {}
-    for _, row in confusion_df.iterrows():
-        pair = tuple(sorted([row['From'], row['To']]))
-        if pair not in bidirectional:
-            bidirectional[pair] = {'count': 0, 'rate': 0}
-        bidirectional[pair]['count'] += row['Count']
-        bidirectional[pair]['rate'] += row['Rate']
-    
-    bidirectional_list = [
-        {'Pair': f"{p[0]} ↔ {p[1]}", 'Total_Count': v['count'], 'Combined_Rate': v['rate']}
-        for p, v in bidirectional.items()
+    class_names = class_names or CONFIG["class_names"]
+    cm = np.asarray(cm)
+    
+    # Confusion rate: how often class i is misclassified as class j
+    totals = cm.sum(axis=1, keepdims=True)
+    rates = np.divide(cm * 100.0, totals, out=np.zeros(cm.shape), where=totals > 0)
+    np.fill_diagonal(rates, 0)
+    
+    # Aggregate bidirectional confusion over the upper triangle
+    rows, cols = np.triu_indices(len(cm), k=1)
+    pair_counts = (cm + cm.T)[rows, cols]
+    pair_rates = (rates + rates.T)[rows, cols]
+    
+    confused = pair_counts > 0
+    rows, cols = rows[confused], cols[confused]
+    pair_counts, pair_rates = pair_counts[confused], pair_rates[confused]
+    order = np.argsort(-pair_counts, kind='stable')
+    
+    pair_names = [
+        " ↔ ".join(sorted((class_names[i], class_names[j])))
+        for i, j in zip(rows[order], cols[order])
     ]
-    bidirectional_df = pd.DataFrame(bidirectional_list)
-    bidirectional_df = bidirectional_df.sort_values('Total_Count', ascending=False)
+    bidirectional_df = pd.DataFrame({
+        'Pair': pair_names,
+        'Total_Count': pair_counts[order],
+        'Combined_Rate': pair_rates[order]
+    })
     
     print("\n  Top 10 Most Confused Sign Pairs (Bidirectional):")
     print("  " + "-"*45)
     print(f"  {'Pair':<12} {'Total Errors':>15} {'Combined Rate':>15}")
     print("  " + "-"*45)
-    for _, row in bidirectional_df.head(10).iterrows():
-        print(f"  {row['Pair']:<12} {int(row['Total_Count']):>15} {row['Combined_Rate']:>14.1f}%")
+    top = bidirectional_df.head(10)
+    for pair, count, rate in zip(top['Pair'], top['Total_Count'], top['Combined_Rate']):
+        print(f"  {pair:<12} {int(count):>15} {rate:>14.1f}%")
     
     return bidirectional_df
 
@@ -463,7 +701,7 @@ def generate_research_paper_metrics(results, class_metrics, confusion_pairs):
     
     return report_text
 
-def save_full_report(results, class_metrics, confusion_pairs, cm, output_dir):
+def save_full_report(results, class_metrics, confusion_pairs, cm, output_dir, fingerprint=None):
     """Save complete evaluation report to file."""
     print("\n" + "="*60)
     print("SAVING FULL REPORT")
@@ -474,9 +712,10 @@ def save_full_report(results, class_metrics, confusion_pairs, cm, output_dir):
     # Save metrics to JSON
     metrics_json = {
         "timestamp": timestamp,
-        "training": {k: v for k, v in results['training'].items() if k not in ['y_true', 'y_pred', 'y_pred_proba']},
-        "validation": {k: v for k, v in results['validation'].items() if k not in ['y_true', 'y_pred', 'y_pred_proba']},
-        "test": {k: v for k, v in results['test'].items() if k not in ['y_true', 'y_pred', 'y_pred_proba']},
+        "fingerprint": fingerprint,
+        "training": {k: v for k, v in results['training'].items() if k not in ['y_true', 'y_pred', 'y_pred_proba', 'confusion_matrix']},
+        "validation": {k: v for k, v in results['validation'].items() if k not in ['y_true', 'y_pred', 'y_pred_proba', 'confusion_matrix']},
+        "test": {k: v for k, v in results['test'].items() if k not in ['y_true', 'y_pred', 'y_pred_proba', 'confusion_matrix']},
     }
     
     json_path = os.path.join(output_dir, f'evaluation_metrics_{timestamp}.json')
@@ -530,11 +769,93 @@ def save_full_report(results, class_metrics, confusion_pairs, cm, output_dir):
     
     return json_path
 
+# ============================================================================
+# EVALUATION CACHE
+# ============================================================================
+
+SPLIT_NAMES = ["Training", "Validation", "Test"]
+
+def _hash_path(path, chunk_size=1 << 20):
+    """sha256 of a file, or of every file (with its relative name) under a directory."""
+    digest = hashlib.sha256()
+    if os.path.isdir(path):
+        files = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+    else:
+        files = [path]
+    for file_path in files:
+        digest.update(os.path.relpath(file_path, path).encode())
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+def evaluation_fingerprint(model_path):
+    """
+    Fingerprint of everything the predictions depend on: model bytes, dataset
+    bytes (the same source load_dataset() would pick) and the split config.
+    Returns (fingerprint, manifest), or (None, None) if an input is missing.
+    """
+    dataset_path = dataset_source()
+    if dataset_path is None or not os.path.exists(model_path):
+        return None, None
+    
+    manifest = {
+        "model_path": model_path,
+        "model_sha256": _hash_path(model_path),
+        "dataset_path": dataset_path,
+        "dataset_sha256": _hash_path(dataset_path),
+        "split": {key: CONFIG[key] for key in ("test_split", "val_split", "random_seed", "class_names")},
+    }
+    fingerprint = hashlib.sha256(json.dumps(manifest["split"], sort_keys=True).encode())
+    fingerprint.update(manifest["model_sha256"].encode())
+    fingerprint.update(manifest["dataset_sha256"].encode())
+    
+    return fingerprint.hexdigest()[:16], manifest
+
+def load_cached_predictions(fingerprint):
+    """Rebuild the evaluate_model() results from stored predictions, or None on a miss."""
+    cache_path = os.path.join(CONFIG["cache_dir"], fingerprint)
+    split_files = [os.path.join(cache_path, f"{name.lower()}.npz") for name in SPLIT_NAMES]
+    if not all(os.path.exists(path) for path in split_files):
+        return None
+    
+    print("\n" + "="*60)
+    print("EVALUATING MODEL (CACHED PREDICTIONS)")
+    print("="*60)
+    print(f"✓ Reusing predictions from: {cache_path}")
+    
+    results = {}
+    for name, path in zip(SPLIT_NAMES, split_files):
+        with np.load(path) as stored:
+            results[name.lower()] = split_results(name, stored['y_true'], stored['y_pred_proba'])
+    return results
+
+def save_cached_predictions(fingerprint, manifest, results):
+    """Store y_true and y_pred_proba per split as compressed .npz plus the fingerprint manifest."""
+    cache_path = os.path.join(CONFIG["cache_dir"], fingerprint)
+    os.makedirs(cache_path, exist_ok=True)
+    
+    # Manifest first, split files last: a run that dies midway is a cache miss
+    with open(os.path.join(cache_path, "fingerprint.json"), 'w') as f:
+        json.dump({**manifest, "created": datetime.now().isoformat(timespec='seconds')}, f, indent=2)
+    
+    for name in SPLIT_NAMES:
+        split = results[name.lower()]
+        tmp_path = os.path.join(cache_path, f"{name.lower()}.tmp.npz")
+        np.savez_compressed(
+            tmp_path,
+            y_true=np.asarray(split['y_true'], dtype=np.int32),
+            y_pred_proba=np.asarray(split['y_pred_proba'], dtype=np.float32)
+        )
+        os.replace(tmp_path, os.path.join(cache_path, f"{name.lower()}.npz"))
+    
+    print(f"✓ Predictions cached in: {cache_path}")
+
 # ============================================================================
 # MAIN EXECUTION
 # ============================================================================
 
-def main():
+def main(model_path=None):
     """Main evaluation pipeline."""
     print("\n" + "="*70)
     print("   KAIROAI MODEL EVALUATION SCRIPT")
@@ -544,30 +865,40 @@ def main():
     # Create output directory
     create_output_dir()
     
-    # Load dataset
-    X, y, df = load_dataset()
-    if X is None:
-        print("\n✗ Failed to load dataset. Please check the CSV path.")
-        return
-    
-    # Load model
-    model = load_model()
-    if model is None:
-        print("\n✗ Failed to load model. Please check the model path.")
-        return
-    
-    # Split data
-    X_train, X_val, X_test, y_train, y_val, y_test = split_data(X, y)
-    
-    # Evaluate model
-    results = evaluate_model(model, X_train, X_val, X_test, y_train, y_val, y_test)
+    # Reuse stored predictions when model, dataset and split config are unchanged
+    model_path = model_path or CONFIG["model_path"]
+    fingerprint, manifest = evaluation_fingerprint(model_path) if CONFIG["use_cache"] else (None, None)
+    results = load_cached_predictions(fingerprint) if fingerprint else None
+    
+    if results is None:
+        # Load dataset
+        X, y, df = load_dataset()
+        if X is None:
+            print("\n✗ Failed to load dataset. Please check the dataset/CSV path.")
+            return
+        
+        # Load model
+        model = load_model(model_path)
+        if model is None:
+            print("\n✗ Failed to load model. Please check the model path.")
+            return
+        
+        # Split data
+        X_train, X_val, X_test, y_train, y_val, y_test = split_data(X, y)
+        
+        # Evaluate model
+        results = evaluate_model(model, X_train, X_val, X_test, y_train, y_val, y_test)
+        
+        if fingerprint:
+            save_cached_predictions(fingerprint, manifest, results)
     
     # Generate confusion matrix
     cm_path = os.path.join(CONFIG["output_dir"], "confusion_matrix.png")
-    cm = generate_confusion_matrix(results['test']['y_true'], results['test']['y_pred'], cm_path)
+    cm = generate_confusion_matrix(results['test']['y_true'], results['test']['y_pred'], cm_path,
+                                   cm=results['test']['confusion_matrix'])
     
     # Analyze per-class performance
-    class_metrics = analyze_per_class_performance(results['test']['y_true'], results['test']['y_pred'])
+    class_metrics = analyze_per_class_performance(results['test']['y_true'], results['test']['y_pred'], cm)
     
     # Analyze confusion pairs
     confusion_pairs = analyze_confusion_pairs(cm)
@@ -579,22 +910,44 @@ def main():
     report = generate_research_paper_metrics(results, class_metrics, confusion_pairs)
     
     # Save full report
-    save_full_report(results, class_metrics, confusion_pairs, cm, CONFIG["output_dir"])
+    save_full_report(results, class_metrics, confusion_pairs, cm, CONFIG["output_dir"], fingerprint)
     
     print("\n" + "="*70)
     print("   EVALUATION COMPLETE!")
     print("="*70)
     print(f"\n  All results saved to: {CONFIG['output_dir']}/")
     print("\n  Files generated:")
-    print("    • confusion_matrix.png - Visual confusion matrix")
+    print("    • confusion_matrix.png/.html - Visual confusion matrix (see --cm-render)")
     print("    • training_curves.png - Accuracy/Loss plots")
     print("    • evaluation_metrics_*.json - Metrics in JSON format")
     print("    • per_class_metrics_*.csv - Per-class performance")
     print("    • confusion_pairs_*.csv - Most confused pairs")
     print("    • classification_report_*.txt - Full sklearn report")
+    print("    • cache/<fingerprint>/*.npz - Stored predictions per split")
     print("\n  Use the printed metrics above to replace placeholders")
     print("  in RESEARCH_PAPER_RESULTS_DISCUSSION.md")
     print("="*70 + "\n")
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Evaluate the ISL classification model')
+    parser.add_argument('--model', type=str, default=CONFIG["model_path"],
+                        help='Model to evaluate (.tflite, .h5, .keras or SavedModel directory)')
+    parser.add_argument('--batch-size', type=int, default=CONFIG["batch_size"],
+                        help='Samples per inference call')
+    parser.add_argument('--threads', type=int, default=CONFIG["num_threads"],
+                        help='TFLite interpreter threads')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Recompute predictions even if a cached result matches')
+    parser.add_argument('--cm-render', type=str, default=CONFIG["cm_render"],
+                        choices=['fast', 'annotated', 'html', 'none'],
+                        help='Confusion matrix output: fast imshow PNG, annotated 300 dpi PNG, HTML/SVG or none')
+    
+    args = parser.parse_args()
+    CONFIG["batch_size"] = args.batch_size
+    CONFIG["num_threads"] = args.threads
+    CONFIG["cm_render"] = args.cm_render
+    CONFIG["use_cache"] = not args.no_cache
+    
+    main(args.model)
@@ -35,14 +35,21 @@ import numpy as np
 import mediapipe as mp
 import json
 import csv
+import hashlib
+import sqlite3
+import multiprocessing
 from pathlib import Path
 
+from landmark_features import normalize_hands, stack_hands
+from landmark_dataset import feature_columns, save_dataset, dataset_exists, remove_dataset
+
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
 
 DATASET_PATH = "./Indian"
 OUTPUT_CSV = "landmark_dataset_with_orientation.csv"
+OUTPUT_DATASET = "landmark_dataset_with_orientation"  # Binary (.npy) dataset directory
 OUTPUT_LABELS = "labels_orientation.json"
 
 # Model configuration
@@ -52,6 +59,21 @@ INPUT_SIZE_TOTAL = INPUT_SIZE_LANDMARKS + INPUT_SIZE_ORIENTATION  # 130 features
 
 NUM_CLASSES = 35
 
+# Parallel extraction: images handed to each worker per dispatch
+WORKER_CHUNKSIZE = 32
+
+# MediaPipe settings (also part of the landmark cache key)
+MEDIAPIPE_CONFIG = {
+    'static_image_mode': True,
+    'max_num_hands': 2,
+    'min_detection_confidence': 0.5,
+    'min_tracking_confidence': 0.5,
+}
+
+# Persistent landmark cache (keyed by image content hash + extractor config)
+LANDMARK_CACHE = "landmark_cache.sqlite"
+CACHE_FORMAT_VERSION = 1
+
 LABELS = [
     'A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J',
     'K', 'L', 'M', 'N', 'O', 'P', 'Q', 'R', 'S', 'T',
@@ -72,12 +94,7 @@ ORIENTATION_SENSITIVE_SIGNS = {
 def setup_mediapipe():
     """Initialize MediaPipe Hands detector"""
     mp_hands = mp.solutions.hands
-    hands = mp_hands.Hands(
-        static_image_mode=True,
-        max_num_hands=2,
-        min_detection_confidence=0.5,
-        min_tracking_confidence=0.5
-    )
+    hands = mp_hands.Hands(**MEDIAPIPE_CONFIG)
     return hands, mp_hands
 
 
@@ -211,61 +228,35 @@ def normalize_landmarks(hands_data):
     """
     Normalize landmarks to be position and scale invariant.
     Matches the normalization used in Android app.
-    """
-    normalized = []
     
-    for hand_data in hands_data:
-        if hand_data is None:
-            normalized.extend([0.0] * 63)
-            continue
-        
-        # Get wrist position
-        wrist = hand_data[0]
-        wrist_x, wrist_y, wrist_z = wrist
-        
-        # Calculate hand size (wrist to middle finger MCP)
-        mcp = hand_data[9]
-        hand_size = np.sqrt(
-            (mcp[0] - wrist_x) ** 2 +
-            (mcp[1] - wrist_y) ** 2 +
-            (mcp[2] - wrist_z) ** 2
-        )
-        
-        if hand_size < 0.001:
-            hand_size = 0.001
-        
-        # Normalize each landmark
-        for lm in hand_data:
-            norm_x = (lm[0] - wrist_x) / hand_size
-            norm_y = (lm[1] - wrist_y) / hand_size
-            norm_z = (lm[2] - wrist_z) / hand_size
-            normalized.extend([norm_x, norm_y, norm_z])
-    
-    return normalized
+    Single-sample wrapper around landmark_features.normalize_hands().
+    """
+    return normalize_hands(stack_hands(hands_data)).tolist()
 
 
-def extract_landmarks_from_image(hands, image_path):
+def detect_hands(hands, image_path):
     """
-    Extract hand landmarks AND orientation from an image.
+    Run MediaPipe on an image and return the raw (un-normalized) detection.
     
     Returns:
-        landmarks: 126 normalized landmark values (or None if no hand)
-        orientations: list of (orientation, is_left) tuples for each hand
+        None if the image could not be read, otherwise (hands_data, orientations)
+        with one entry per detected hand (at most 2):
+        - hands_data: 21 [x, y, z] landmark coordinates per hand
+        - orientations: (orientation, is_left) per hand
     """
     image = cv2.imread(str(image_path))
     if image is None:
-        return None, None
+        return None
     
     image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
     results = hands.process(image_rgb)
     
-    if not results.multi_hand_landmarks:
-        return None, None
-    
-    # Extract landmarks and orientations for each hand
     hands_data = []
     orientations = []
     
+    if not results.multi_hand_landmarks:
+        return hands_data, orientations
+    
     for idx, hand_landmarks in enumerate(results.multi_hand_landmarks[:2]):
         # Get handedness for this hand
         if results.multi_handedness and idx < len(results.multi_handedness):
@@ -291,22 +282,261 @@ def extract_landmarks_from_image(hands, image_path):
         
         orientations.append((orientation, is_left))
     
-    # Pad with None/defaults if only 1 hand detected
-    while len(hands_data) < 2:
-        hands_data.append(None)
+    return hands_data, orientations
+
+
+def pad_detection(detection):
+    """
+    Pack a raw detection into fixed-size arrays for batched normalization.
+    
+    Returns:
+        hands: (2, 21, 3) raw landmarks, zeros for a missing hand (or None if no hand)
+        orientations: list of 2 (orientation, is_left) tuples, (-1.0, -1.0) if missing
+    """
+    if detection is None or not detection[0]:
+        return None, None
+    
+    orientations = [tuple(o) for o in detection[1]]
     while len(orientations) < 2:
         orientations.append((-1.0, -1.0))  # -1 indicates no hand
     
-    # Normalize landmarks
-    normalized = normalize_landmarks(hands_data)
+    return stack_hands(detection[0]), orientations
+
+
+def build_features(detection):
+    """
+    Turn a raw detection from detect_hands() into model features.
     
-    if len(normalized) != INPUT_SIZE_LANDMARKS:
+    Returns:
+        landmarks: 126 normalized landmark values (or None if no hand)
+        orientations: list of (orientation, is_left) tuples for each hand
+    """
+    hands, orientations = pad_detection(detection)
+    if hands is None:
         return None, None
     
-    return normalized, orientations
+    return normalize_hands(hands).tolist(), orientations
 
 
-def extract_dataset():
+def extract_landmarks_from_image(hands, image_path):
+    """
+    Extract hand landmarks AND orientation from an image.
+    
+    Returns:
+        landmarks: 126 normalized landmark values (or None if no hand)
+        orientations: list of (orientation, is_left) tuples for each hand
+    """
+    return build_features(detect_hands(hands, image_path))
+
+
+# ============================================================================
+# LANDMARK CACHE
+# ============================================================================
+
+def extractor_config_key():
+    """Fingerprint of everything that affects a raw detection."""
+    config = {
+        'format': CACHE_FORMAT_VERSION,
+        'mediapipe': getattr(mp, '__version__', 'unknown'),
+        'hands': MEDIAPIPE_CONFIG,
+        'max_hands': 2,
+        'orientation_method': 'v2',
+    }
+    blob = json.dumps(config, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(blob).hexdigest()[:16]
+
+
+def hash_image_file(image_path):
+    """SHA-256 of the raw image bytes."""
+    h = hashlib.sha256()
+    with open(image_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class LandmarkCache:
+    """
+    Persistent on-disk cache of raw MediaPipe detections.
+    
+    Entries are keyed by image content hash plus the extractor config key, so
+    renamed/moved images still hit and any MediaPipe or setting change misses.
+    Raw landmarks are stored as float64 (lossless for MediaPipe output), so
+    features built from a cache hit are identical to a fresh extraction.
+    Images where no hand was found are cached as well.
+    """
+    
+    def __init__(self, path=LANDMARK_CACHE, config_key=None):
+        self.path = path
+        self.config_key = config_key or extractor_config_key()
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS detections ("
+            " image_hash TEXT NOT NULL,"
+            " config_key TEXT NOT NULL,"
+            " num_hands INTEGER NOT NULL,"
+            " landmarks BLOB NOT NULL,"
+            " orientations TEXT NOT NULL,"
+            " PRIMARY KEY (image_hash, config_key))"
+        )
+        self.conn.commit()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, image_hash):
+        """Return the cached detection for an image hash, or None."""
+        row = self.conn.execute(
+            "SELECT num_hands, landmarks, orientations FROM detections"
+            " WHERE image_hash = ? AND config_key = ?",
+            (image_hash, self.config_key)
+        ).fetchone()
+        
+        if row is None:
+            self.misses += 1
+            return None
+        
+        self.hits += 1
+        num_hands, blob, orientations = row
+        hands_data = np.frombuffer(blob, dtype=np.float64).reshape(num_hands, 21, 3)
+        return hands_data.tolist(), [tuple(o) for o in json.loads(orientations)]
+    
+    def put(self, image_hash, detection):
+        """Store a raw detection (as returned by detect_hands)."""
+        hands_data, orientations = detection
+        blob = np.asarray(hands_data, dtype=np.float64).reshape(-1, 21, 3).tobytes()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO detections VALUES (?, ?, ?, ?, ?)",
+            (image_hash, self.config_key, len(hands_data), blob,
+             json.dumps([list(o) for o in orientations]))
+        )
+    
+    def commit(self):
+        self.conn.commit()
+    
+    def invalidate(self, stale_only=False):
+        """Delete cache entries. With stale_only, keep entries for the current config."""
+        if stale_only:
+            cur = self.conn.execute(
+                "DELETE FROM detections WHERE config_key != ?", (self.config_key,)
+            )
+        else:
+            cur = self.conn.execute("DELETE FROM detections")
+        self.conn.commit()
+        self.conn.execute("VACUUM")
+        return cur.rowcount
+    
+    def summary(self):
+        """Entry counts for the current and other (stale) configs."""
+        current, total = self.conn.execute(
+            "SELECT SUM(config_key = ?), COUNT(*) FROM detections", (self.config_key,)
+        ).fetchone()
+        current = current or 0
+        return {'current': current, 'stale': total - current, 'total': total}
+    
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+    
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+# ============================================================================
+# PARALLEL EXTRACTION
+# ============================================================================
+
+_worker_hands = None
+
+
+def _init_worker():
+    """Give each worker process its own MediaPipe Hands instance."""
+    global _worker_hands
+    _worker_hands, _ = setup_mediapipe()
+
+
+def _detect_safe(hands, image_path):
+    """Run detection on one image, returning (detection, error)."""
+    try:
+        return detect_hands(hands, image_path), None
+    except Exception as e:
+        return None, str(e)
+
+
+def _detect_in_worker(image_path):
+    return _detect_safe(_worker_hands, image_path)
+
+
+def iter_detections(image_paths, workers=1):
+    """
+    Yield (detection, error) for each image, in input order.
+    
+    With workers > 1 the images are sharded across a process pool where every
+    worker owns its own MediaPipe instance. Results are streamed back in the
+    original order, so the output is identical to a serial run.
+    """
+    if workers <= 1:
+        hands, _ = setup_mediapipe()
+        try:
+            for image_path in image_paths:
+                yield _detect_safe(hands, image_path)
+        finally:
+            hands.close()
+        return
+    
+    with multiprocessing.Pool(workers, initializer=_init_worker) as pool:
+        yield from pool.imap(_detect_in_worker, image_paths,
+                             chunksize=WORKER_CHUNKSIZE)
+
+
+def _hash_safe(image_path):
+    """Hash one image, returning (hash, error) like _detect_safe."""
+    try:
+        return hash_image_file(image_path), None
+    except Exception as e:
+        return None, str(e)
+
+
+def _iter_cached_detections(image_paths, workers, cache):
+    """
+    Yield (detection, error) per image, serving hits from the cache and
+    running MediaPipe only on the misses. Images that cannot be read for
+    hashing are reported as errors and skipped.
+    """
+    hashed = [_hash_safe(path) for path in image_paths]
+    cached = [cache.get(image_hash) if image_hash is not None else None
+              for image_hash, _ in hashed]
+    
+    misses = [i for i, ((_, error), detection) in enumerate(zip(hashed, cached))
+              if error is None and detection is None]
+    unreadable = sum(error is not None for _, error in hashed)
+    print(f"🗄️  Landmark cache: {len(image_paths) - len(misses) - unreadable} hits, "
+          f"{len(misses)} misses ({cache.hit_rate()*100:.1f}% hit rate)")
+    if unreadable:
+        print(f"⚠️  {unreadable} images could not be read and will be skipped")
+    
+    def merge(fresh):
+        try:
+            for (image_hash, error), detection in zip(hashed, cached):
+                if error is not None:
+                    yield None, error
+                    continue
+                if detection is not None:
+                    yield detection, None
+                    continue
+                
+                detection, error = next(fresh)
+                if detection is not None:
+                    cache.put(image_hash, detection)
+                yield detection, error
+        finally:
+            fresh.close()
+            cache.commit()
+    
+    return merge(iter_detections([image_paths[i] for i in misses], workers))
+
+
+def extract_dataset(workers=1, cache=None):
     """Extract landmarks with orientation from entire dataset"""
     print("\n" + "=" * 70)
     print("ISL LANDMARK EXTRACTION WITH HAND ORIENTATION")
@@ -316,9 +546,7 @@ def extract_dataset():
         print(f"\n❌ ERROR: Dataset not found at '{DATASET_PATH}'")
         return None, None, None
     
-    hands, mp_hands = setup_mediapipe()
-    
-    all_landmarks = []
+    all_hands = []
     all_orientations = []
     all_labels = []
     
@@ -340,48 +568,67 @@ def extract_dataset():
     stats = {'total': 0, 'success': 0, 'failed': 0}
     orientation_stats = {'palm': 0, 'back': 0, 'two_hands': 0}
     
+    # Collect the full work list up front so it can be sharded across workers
+    jobs = []
     for folder, label_idx in label_to_idx.items():
         folder_path = os.path.join(DATASET_PATH, folder)
         images = [f for f in os.listdir(folder_path)
                   if f.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp'))]
-        
+        jobs.append((folder, label_idx, images))
+    
+    image_paths = [os.path.join(DATASET_PATH, folder, img_name)
+                   for folder, _, images in jobs for img_name in images]
+    
+    if workers > 1:
+        print(f"⚙️  Using {workers} worker processes")
+    
+    if cache is not None:
+        results = _iter_cached_detections(image_paths, workers, cache)
+    else:
+        results = iter_detections(image_paths, workers)
+    
+    for folder, label_idx, images in jobs:
         print(f"\n🔄 Processing '{folder}' ({len(images)} images)...")
         
         success_count = 0
         for i, img_name in enumerate(images):
-            img_path = os.path.join(folder_path, img_name)
             stats['total'] += 1
+            detection, error = next(results)
+            hands, orientations = pad_detection(detection)
             
-            try:
-                landmarks, orientations = extract_landmarks_from_image(hands, img_path)
+            if error is not None:
+                stats['failed'] += 1
+                print(f"      Error processing {img_name}: {error}")
+            elif hands is not None:
+                all_hands.append(hands)
+                all_orientations.append(orientations)
+                all_labels.append(label_idx)
+                stats['success'] += 1
+                success_count += 1
                 
-                if landmarks is not None:
-                    all_landmarks.append(landmarks)
-                    all_orientations.append(orientations)
-                    all_labels.append(label_idx)
-                    stats['success'] += 1
-                    success_count += 1
-                    
-                    # Track orientation statistics
-                    if orientations[0][0] == 1.0:
-                        orientation_stats['palm'] += 1
-                    elif orientations[0][0] == 0.0:
-                        orientation_stats['back'] += 1
-                    
-                    if orientations[1][0] != -1.0:  # Second hand detected
-                        orientation_stats['two_hands'] += 1
-                else:
-                    stats['failed'] += 1
-            except Exception as e:
+                # Track orientation statistics
+                if orientations[0][0] == 1.0:
+                    orientation_stats['palm'] += 1
+                elif orientations[0][0] == 0.0:
+                    orientation_stats['back'] += 1
+                
+                if orientations[1][0] != -1.0:  # Second hand detected
+                    orientation_stats['two_hands'] += 1
+            else:
                 stats['failed'] += 1
-                print(f"      Error processing {img_name}: {e}")
             
             if (i + 1) % 100 == 0:
                 print(f"   Processed {i+1}/{len(images)}...")
         
         print(f"   ✓ {success_count}/{len(images)} images extracted")
     
-    hands.close()
+    results.close()
+    
+    # Normalize every sample in one batched pass
+    if all_hands:
+        all_landmarks = normalize_hands(np.stack(all_hands)).tolist()
+    else:
+        all_landmarks = []
     
     # Print statistics
     print("\n" + "=" * 70)
@@ -407,20 +654,8 @@ def save_to_csv(landmarks, orientations, labels):
         
         # Create header
         # Landmark columns: hand1_lm0_x, hand1_lm0_y, hand1_lm0_z, ..., hand2_lm20_x, hand2_lm20_y, hand2_lm20_z
-        header = []
-        for hand_idx in range(2):
-            for lm_idx in range(21):
-                for coord in ['x', 'y', 'z']:
-                    header.append(f'hand{hand_idx+1}_lm{lm_idx}_{coord}')
-        
-        # Orientation columns
-        header.extend([
-            'hand1_orientation',  # 1.0=palm, 0.0=back, -1.0=no hand
-            'hand1_is_left',      # 1.0=left, 0.0=right, -1.0=no hand
-            'hand2_orientation',
-            'hand2_is_left',
-            'label'
-        ])
+        # followed by the 4 orientation columns
+        header = feature_columns() + ['label']
         
         writer.writerow(header)
         
@@ -441,8 +676,27 @@ def save_to_csv(landmarks, orientations, labels):
     
     print(f"   ✅ Saved {len(landmarks)} samples")
     print(f"   📄 Total columns: {INPUT_SIZE_TOTAL + 1} (130 features + 1 label)")
+
+
+def save_to_binary(landmarks, orientations, labels):
+    """Save extracted data in the memory-mappable binary format"""
+    print(f"\n💾 Saving to '{OUTPUT_DATASET}/'...")
+    
+    features = np.empty((len(landmarks), INPUT_SIZE_TOTAL), dtype=np.float32)
+    features[:, :INPUT_SIZE_LANDMARKS] = landmarks
+    features[:, INPUT_SIZE_LANDMARKS:] = [
+        (orient[0][0], orient[0][1], orient[1][0], orient[1][1])
+        for orient in orientations
+    ]
+    
+    save_dataset(features, labels, LABELS, OUTPUT_DATASET)
     
-    # Save labels mapping
+    print(f"   ✅ Saved {len(landmarks)} samples")
+    print(f"   📦 Size: {features.nbytes / 1024 / 1024:.2f} MB (float32)")
+
+
+def save_labels():
+    """Save labels mapping"""
     with open(OUTPUT_LABELS, 'w') as f:
         json.dump({
             'labels': LABELS,
@@ -576,10 +830,31 @@ if __name__ == "__main__":
     parser.add_argument('--test', action='store_true', help='Test orientation detection on samples')
     parser.add_argument('--visualize', type=str, help='Visualize orientation on a single image')
     parser.add_argument('--output', type=str, help='Output path for visualization')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Worker processes for extraction (0 = all cores)')
+    parser.add_argument('--cache', type=str, default=LANDMARK_CACHE,
+                        help='Landmark cache file')
+    parser.add_argument('--no-cache', action='store_true', help='Disable the landmark cache')
+    parser.add_argument('--cache-stats', action='store_true', help='Show landmark cache statistics')
+    parser.add_argument('--format', choices=['both', 'npy', 'csv'], default='both',
+                        help='Output format: binary .npy dataset, CSV, or both')
+    parser.add_argument('--invalidate-cache', choices=['all', 'stale'],
+                        help='Clear the landmark cache (stale = entries from other configs)')
     
     args = parser.parse_args()
     
-    if args.test:
+    if args.cache_stats or args.invalidate_cache:
+        cache = LandmarkCache(args.cache)
+        if args.invalidate_cache:
+            removed = cache.invalidate(stale_only=args.invalidate_cache == 'stale')
+            print(f"🗑️  Removed {removed} cache entries from '{args.cache}'")
+        summary = cache.summary()
+        print(f"🗄️  Landmark cache '{args.cache}' (config {cache.config_key}):")
+        print(f"   Current entries: {summary['current']}")
+        print(f"   Stale entries:   {summary['stale']}")
+        print(f"   File size: {os.path.getsize(args.cache) / 1024:.1f} KB")
+        cache.close()
+    elif args.test:
         test_orientation_detection()
     elif args.visualize:
         visualize_orientation_detection(args.visualize, args.output)
@@ -587,16 +862,34 @@ if __name__ == "__main__":
         # Main extraction
         print("\n🚀 Starting landmark extraction with orientation detection...")
         
-        landmarks, orientations, labels = extract_dataset()
+        workers = args.workers if args.workers > 0 else os.cpu_count()
+        cache = None if args.no_cache else LandmarkCache(args.cache)
+        landmarks, orientations, labels = extract_dataset(workers=workers, cache=cache)
+        if cache is not None:
+            print(f"\n🗄️  Cache hit rate: {cache.hit_rate()*100:.1f}% "
+                  f"({cache.hits} hits, {cache.misses} misses)")
+            cache.close()
         
         if landmarks:
-            save_to_csv(landmarks, orientations, labels)
+            # CSV first: a binary dataset older than the CSV is treated as stale
+            if args.format in ('both', 'csv'):
+                save_to_csv(landmarks, orientations, labels)
+            if args.format in ('both', 'npy'):
+                save_to_binary(landmarks, orientations, labels)
+            elif dataset_exists(OUTPUT_DATASET):
+                # Don't leave a binary dataset from an earlier run for training to pick up
+                remove_dataset(OUTPUT_DATASET)
+                print(f"   🗑️  Removed stale binary dataset '{OUTPUT_DATASET}/'")
+            save_labels()
             
             print("\n" + "=" * 70)
             print("✅ EXTRACTION COMPLETE!")
             print("=" * 70)
             print(f"\nOutput files:")
-            print(f"   📄 {OUTPUT_CSV} - Landmark data with orientation")
+            if args.format in ('both', 'npy'):
+                print(f"   📦 {OUTPUT_DATASET}/ - Binary landmark dataset (memory-mappable)")
+            if args.format in ('both', 'csv'):
+                print(f"   📄 {OUTPUT_CSV} - Landmark data with orientation")
             print(f"   📄 {OUTPUT_LABELS} - Label mapping and feature info")
             print(f"\nNext steps:")
             print(f"   1. Train model with: python train_with_orientation.py")
@@ -0,0 +1,304 @@
+"""
+================================================================================
+BINARY LANDMARK DATASET FORMAT
+================================================================================
+Columnar on-disk format for the extracted landmark dataset, replacing the
+text CSV as the primary training/evaluation input.
+
+LAYOUT (a directory):
+- features.npy  float32 (N, 130) - 126 landmarks + 4 orientation features
+- labels.npy    int32   (N,)     - index into meta['labels']
+- meta.json     label names, feature column names, sample count
+
+The .npy files are loaded with mmap_mode='r', so opening the dataset is
+zero-copy: no text parsing and no RAM spike, only the pages actually read
+are brought into memory. The CSV can still be produced with export_csv().
+
+Rows are stored in a random (seeded) order rather than grouped by class, so
+any contiguous region of the file holds a mix of classes.
+
+Because the features stay on disk, read_rows() and chunked_shuffle() let a
+training generator index straight into a dataset larger than RAM.
+
+Usage:
+    python landmark_dataset.py --export-csv landmark_dataset_with_orientation.csv
+    python landmark_dataset.py --from-csv landmark_dataset_with_orientation.csv
+
+Author: KairoAI
+================================================================================
+"""
+
+import os
+import csv
+import json
+
+import numpy as np
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+DATASET_DIR = "landmark_dataset_with_orientation"
+FEATURES_FILE = "features.npy"
+LABELS_FILE = "labels.npy"
+META_FILE = "meta.json"
+
+FORMAT_VERSION = 1
+
+# Seed for the row permutation applied when writing a dataset
+ROW_ORDER_SEED = 42
+
+DEFAULT_LABELS = [
+    'A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J',
+    'K', 'L', 'M', 'N', 'O', 'P', 'Q', 'R', 'S', 'T',
+    'U', 'V', 'W', 'X', 'Y', 'Z', '1', '2', '3', '4',
+    '5', '6', '7', '8', '9'
+]
+
+ORIENTATION_COLUMNS = [
+    'hand1_orientation',  # 1.0=palm, 0.0=back, -1.0=no hand
+    'hand1_is_left',      # 1.0=left, 0.0=right, -1.0=no hand
+    'hand2_orientation',
+    'hand2_is_left',
+]
+
+
+def feature_columns():
+    """Column names for the 130 features, in dataset order."""
+    columns = []
+    for hand_idx in range(2):
+        for lm_idx in range(21):
+            for coord in ['x', 'y', 'z']:
+                columns.append(f'hand{hand_idx+1}_lm{lm_idx}_{coord}')
+    columns.extend(ORIENTATION_COLUMNS)
+    return columns
+
+
+# ============================================================================
+# SAVE / LOAD
+# ============================================================================
+
+def dataset_exists(path=DATASET_DIR):
+    """True if a binary dataset is present at path."""
+    return all(os.path.exists(os.path.join(path, name))
+               for name in (FEATURES_FILE, LABELS_FILE, META_FILE))
+
+
+def csv_is_newer(csv_path, path=DATASET_DIR):
+    """
+    True if csv_path was written after the binary dataset at path, i.e. the
+    binary copy is stale (e.g. a later CSV-only extraction left it behind).
+    """
+    return (os.path.exists(csv_path) and dataset_exists(path) and
+            os.path.getmtime(csv_path) > os.path.getmtime(os.path.join(path, META_FILE)))
+
+
+def remove_dataset(path=DATASET_DIR):
+    """Delete a binary dataset (its files, and the directory if left empty)."""
+    for name in (FEATURES_FILE, LABELS_FILE, META_FILE):
+        file_path = os.path.join(path, name)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+    if os.path.isdir(path) and not os.listdir(path):
+        os.rmdir(path)
+
+
+def save_dataset(features, labels, label_names, path=DATASET_DIR, shuffle=True):
+    """
+    Write a binary dataset.
+
+    Args:
+        features: (N, 130) array-like of features
+        labels: (N,) label indices into label_names
+        label_names: list of label strings
+        shuffle: store rows in a seeded random order (extractors emit them
+            grouped by class, which would make every contiguous read one class)
+    """
+    features = np.asarray(features, dtype=np.float32)
+    labels = np.asarray(labels, dtype=np.int32)
+
+    if features.ndim != 2 or len(features) != len(labels):
+        raise ValueError(f"Expected (N, F) features and (N,) labels, "
+                         f"got {features.shape} and {labels.shape}")
+
+    if shuffle:
+        order = np.random.RandomState(ROW_ORDER_SEED).permutation(len(labels))
+        features, labels = features[order], labels[order]
+
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, FEATURES_FILE), features)
+    np.save(os.path.join(path, LABELS_FILE), labels)
+
+    _write_meta(path, len(features), features.shape[1], label_names)
+
+
+def _write_meta(path, num_samples, feature_size, label_names):
+    columns = feature_columns()
+    with open(os.path.join(path, META_FILE), 'w') as f:
+        json.dump({
+            'format_version': FORMAT_VERSION,
+            'num_samples': int(num_samples),
+            'feature_size': int(feature_size),
+            'feature_columns': columns if len(columns) == feature_size else None,
+            'labels': list(label_names),
+        }, f, indent=2)
+
+
+def load_dataset(path=DATASET_DIR, mmap=True):
+    """
+    Load a binary dataset.
+
+    Returns:
+        features: (N, F) float32 array (read-only memmap when mmap=True)
+        labels: (N,) int32 label indices
+        meta: dict from meta.json
+    """
+    mmap_mode = 'r' if mmap else None
+    features = np.load(os.path.join(path, FEATURES_FILE), mmap_mode=mmap_mode)
+    labels = np.load(os.path.join(path, LABELS_FILE), mmap_mode=mmap_mode)
+
+    with open(os.path.join(path, META_FILE), 'r') as f:
+        meta = json.load(f)
+
+    return features, labels, meta
+
+
+def remap_labels(labels, source_names, target_names):
+    """
+    Map label indices from one label list to another.
+    Labels missing from target_names become -1.
+    """
+    lookup = np.array([target_names.index(name) if name in target_names else -1
+                       for name in source_names], dtype=np.int32)
+    return lookup[labels]
+
+
+# ============================================================================
+# CSV CONVERSION
+# ============================================================================
+
+def export_csv(csv_path, path=DATASET_DIR, chunk_size=10000):
+    """Export a binary dataset to the legacy CSV layout (features + label string)."""
+    features, labels, meta = load_dataset(path)
+    label_names = meta['labels']
+
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow((meta.get('feature_columns') or feature_columns()) + ['label'])
+
+        for start in range(0, len(features), chunk_size):
+            chunk = features[start:start + chunk_size].tolist()
+            for row, label_idx in zip(chunk, labels[start:start + chunk_size]):
+                writer.writerow(row + [label_names[label_idx]])
+
+    print(f"✅ Exported {len(features)} samples to '{csv_path}'")
+
+
+def import_csv(csv_path, label_names, path=DATASET_DIR):
+    """
+    Convert a legacy CSV dataset into the binary format.
+
+    Streams rows straight into a memory-mapped .npy file, so peak memory stays
+    at one row regardless of dataset size. Each row is written to a seeded
+    random position, as in save_dataset().
+    """
+    # First pass: count usable rows and features
+    num_rows, num_features = 0, None
+    with open(csv_path, 'r') as f:
+        reader = csv.reader(f)
+        next(reader)  # Skip header
+        for row in reader:
+            if row[-1] in label_names:
+                num_rows += 1
+                num_features = len(row) - 1
+
+    if num_rows == 0:
+        raise ValueError(f"No labelled rows found in {csv_path}")
+
+    os.makedirs(path, exist_ok=True)
+    features = np.lib.format.open_memmap(
+        os.path.join(path, FEATURES_FILE), mode='w+',
+        dtype=np.float32, shape=(num_rows, num_features)
+    )
+    labels = np.empty(num_rows, dtype=np.int32)
+    label_to_idx = {name: idx for idx, name in enumerate(label_names)}
+    order = np.random.RandomState(ROW_ORDER_SEED).permutation(num_rows)
+
+    # Second pass: scatter rows into the memmap in permuted order
+    with open(csv_path, 'r') as f:
+        reader = csv.reader(f)
+        next(reader)  # Skip header
+        i = 0
+        for row in reader:
+            if row[-1] in label_to_idx:
+                features[order[i]] = row[:-1]
+                labels[order[i]] = label_to_idx[row[-1]]
+                i += 1
+
+    features.flush()
+    del features
+    np.save(os.path.join(path, LABELS_FILE), labels)
+    _write_meta(path, num_rows, num_features, label_names)
+
+    print(f"✅ Converted {num_rows} samples to '{path}/'")
+
+
+# ============================================================================
+# MEMORY-MAPPED ACCESS
+# ============================================================================
+
+def read_rows(features, rows):
+    """
+    Gather rows from a (possibly memory-mapped) feature matrix.
+
+    Rows are read in ascending order for sequential disk access and returned
+    in the requested order.
+    """
+    rows = np.asarray(rows)
+    order = np.argsort(rows, kind='stable')
+    out = np.empty((len(rows),) + features.shape[1:], dtype=features.dtype)
+    out[order] = features[rows[order]]
+    return out
+
+
+def chunked_shuffle(n, chunk_size, rng=np.random, chunks_per_window=8):
+    """
+    Shuffle positions 0..n-1 in contiguous chunks.
+
+    The chunk order is shuffled and the chunks are grouped into windows of
+    about chunks_per_window; positions are shuffled across each whole window.
+    Consecutive batches touch only a few regions of a memory-mapped file at a
+    time, yet every batch mixes rows from several distant regions, so a file
+    whose rows are grouped by class still gives class-diverse batches.
+    """
+    if n <= 0:
+        return np.arange(0)
+
+    starts = np.arange(0, n, chunk_size)
+    rng.shuffle(starts)
+    num_windows = -(-len(starts) // chunks_per_window)
+
+    windows = []
+    for window_starts in np.array_split(starts, num_windows):
+        window = np.concatenate([np.arange(start, min(start + chunk_size, n))
+                                 for start in window_starts])
+        windows.append(window[rng.permutation(len(window))])
+    return np.concatenate(windows)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Binary landmark dataset tools')
+    parser.add_argument('--dataset', type=str, default=DATASET_DIR, help='Binary dataset directory')
+    parser.add_argument('--export-csv', type=str, help='Export the binary dataset to this CSV')
+    parser.add_argument('--from-csv', type=str, help='Build the binary dataset from this CSV')
+
+    args = parser.parse_args()
+
+    if args.export_csv:
+        export_csv(args.export_csv, args.dataset)
+    elif args.from_csv:
+        import_csv(args.from_csv, DEFAULT_LABELS, args.dataset)
+    else:
+        parser.print_help()
@@ -0,0 +1,326 @@
+"""
+================================================================================
+ISL MODEL LAYERS AND LOSSES
+================================================================================
+Custom Keras layers and losses used by the advanced ISL model, kept apart
+from the training script so tools that only load a saved model (evaluation,
+export checks) don't import the whole training pipeline.
+
+- FocalLoss - Loss focused on hard examples
+- SelfAttention / ChannelAttention - Attention over landmarks / features
+- FeatureSlice, PassThrough - Serializable slicing and identity layers
+- FakeQuantDense - Dense with int8 fake quantization (QAT)
+- ResidualBlock - Residual Dense block (trainable, fused or quantized)
+
+Load a saved model with keras.models.load_model(path, custom_objects=CUSTOM_OBJECTS).
+
+Author: KairoAI
+================================================================================
+"""
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+from tensorflow.keras import layers, regularizers
+
+
+# ============================================================================
+# FOCAL LOSS - Better for hard examples
+# ============================================================================
+
+class FocalLoss(keras.losses.Loss):
+    """
+    Focal Loss focuses training on hard examples.
+    Reduces loss contribution from easy examples.
+    """
+    def __init__(self, alpha=0.25, gamma=2.0, **kwargs):
+        super().__init__(**kwargs)
+        self.alpha = alpha
+        self.gamma = gamma
+    
+    def call(self, y_true, y_pred):
+        # Clip predictions to prevent log(0)
+        y_pred = tf.clip_by_value(y_pred, 1e-7, 1 - 1e-7)
+        
+        # Calculate focal loss
+        cross_entropy = -y_true * tf.math.log(y_pred)
+        weight = self.alpha * y_true * tf.pow(1 - y_pred, self.gamma)
+        focal_loss = weight * cross_entropy
+        
+        return tf.reduce_sum(focal_loss, axis=-1)
+    
+    def get_config(self):
+        config = super().get_config()
+        config.update({'alpha': self.alpha, 'gamma': self.gamma})
+        return config
+
+
+# ============================================================================
+# ATTENTION LAYER - Focus on important features
+# ============================================================================
+
+class SelfAttention(layers.Layer):
+    """Self-attention layer to focus on important landmarks."""
+    
+    def __init__(self, units, **kwargs):
+        super().__init__(**kwargs)
+        self.units = units
+        
+    def build(self, input_shape):
+        self.W_q = self.add_weight(
+            shape=(input_shape[-1], self.units),
+            initializer='glorot_uniform',
+            trainable=True,
+            name='query_weight'
+        )
+        self.W_k = self.add_weight(
+            shape=(input_shape[-1], self.units),
+            initializer='glorot_uniform',
+            trainable=True,
+            name='key_weight'
+        )
+        self.W_v = self.add_weight(
+            shape=(input_shape[-1], self.units),
+            initializer='glorot_uniform',
+            trainable=True,
+            name='value_weight'
+        )
+        
+    def call(self, x):
+        q = tf.matmul(x, self.W_q)
+        k = tf.matmul(x, self.W_k)
+        v = tf.matmul(x, self.W_v)
+        
+        # Scaled dot-product attention
+        d_k = tf.cast(tf.shape(k)[-1], tf.float32)
+        attention_scores = tf.matmul(q, k, transpose_b=True) / tf.sqrt(d_k)
+        attention_weights = tf.nn.softmax(attention_scores, axis=-1)
+        
+        output = tf.matmul(attention_weights, v)
+        return output
+    
+    def get_config(self):
+        config = super().get_config()
+        config.update({'units': self.units})
+        return config
+
+
+class ChannelAttention(layers.Layer):
+    """Channel attention - learns which features are important."""
+    
+    def __init__(self, reduction_ratio=8, **kwargs):
+        super().__init__(**kwargs)
+        self.reduction_ratio = reduction_ratio
+        
+    def build(self, input_shape):
+        channels = input_shape[-1]
+        self.dense1 = layers.Dense(channels // self.reduction_ratio, activation='relu')
+        self.dense2 = layers.Dense(channels, activation='sigmoid')
+        
+    def call(self, x):
+        # Global average pooling
+        avg_pool = tf.reduce_mean(x, axis=-1, keepdims=True)
+        max_pool = tf.reduce_max(x, axis=-1, keepdims=True)
+        
+        # Shared MLP
+        avg_out = self.dense2(self.dense1(avg_pool))
+        max_out = self.dense2(self.dense1(max_pool))
+        
+        attention = avg_out + max_out
+        return x * attention
+    
+    def get_config(self):
+        config = super().get_config()
+        config.update({'reduction_ratio': self.reduction_ratio})
+        return config
+
+
+class FeatureSlice(layers.Layer):
+    """Slice a range of input features (serializable stand-in for a Lambda)."""
+    
+    def __init__(self, start, end=None, **kwargs):
+        super().__init__(**kwargs)
+        self.start = start
+        self.end = end
+    
+    def call(self, x):
+        return x[:, self.start:self.end]
+    
+    def get_config(self):
+        config = super().get_config()
+        config.update({'start': self.start, 'end': self.end})
+        return config
+
+
+class PassThrough(layers.Layer):
+    """Identity stand-in for layers removed from the inference graph."""
+    
+    def call(self, x, mask=None, training=None):
+        return x
+
+
+class FakeQuantDense(layers.Dense):
+    """
+    Dense layer that simulates int8 inference during training (QAT).
+    
+    The kernel is fake-quantized per output channel (symmetric, narrow
+    range) and the input per tensor, using a moving min/max collected while
+    training. Gradients pass straight through the rounding, so the weights
+    learn to tolerate it. Holds the same kernel/bias as a plain Dense.
+    """
+    
+    def __init__(self, units, ema_decay=0.99, **kwargs):
+        super().__init__(units, **kwargs)
+        self.ema_decay = ema_decay
+    
+    def build(self, input_shape):
+        super().build(input_shape)
+        self.input_min = self.add_weight(name='input_min', shape=(), initializer='zeros',
+                                         trainable=False)
+        self.input_max = self.add_weight(name='input_max', shape=(), initializer='zeros',
+                                         trainable=False)
+    
+    def call(self, inputs, training=None):
+        if training:
+            batch_min = tf.minimum(tf.reduce_min(inputs), 0.0)
+            batch_max = tf.maximum(tf.reduce_max(inputs), 0.0)
+            # First batch initializes the range, later ones update it smoothly
+            uninitialized = tf.equal(self.input_max - self.input_min, 0.0)
+            decay = tf.where(uninitialized, 0.0, self.ema_decay)
+            self.input_min.assign(decay * self.input_min + (1 - decay) * batch_min)
+            self.input_max.assign(decay * self.input_max + (1 - decay) * batch_max)
+        
+        x = tf.quantization.fake_quant_with_min_max_vars(
+            inputs, self.input_min, tf.maximum(self.input_max, self.input_min + 1e-6), num_bits=8
+        )
+        kernel_range = tf.maximum(tf.reduce_max(tf.abs(self.kernel), axis=0), 1e-6)
+        kernel = tf.quantization.fake_quant_with_min_max_vars_per_channel(
+            self.kernel, -kernel_range, kernel_range, num_bits=8, narrow_range=True
+        )
+        
+        outputs = tf.tensordot(x, kernel, axes=[[-1], [0]])
+        if self.use_bias:
+            outputs = outputs + self.bias
+        return self.activation(outputs) if self.activation is not None else outputs
+    
+    def get_config(self):
+        config = super().get_config()
+        config.update({'ema_decay': self.ema_decay})
+        return config
+
+
+# ============================================================================
+# RESIDUAL BLOCK
+# ============================================================================
+
+class ResidualBlock(layers.Layer):
+    """
+    Residual block with skip connection for better gradient flow.
+    
+    fused=True builds the inference-only variant used for export: BatchNorm
+    folded into the Dense layers and no Dropout (see fold_into()).
+    hidden_units sets the width of the inner layer (default: units), which
+    structured pruning narrows. quantize=True uses FakeQuantDense for
+    quantization-aware training.
+    """
+    
+    def __init__(self, units, dropout_rate=0.3, l2_reg=0.001, fused=False,
+                 hidden_units=None, quantize=False, **kwargs):
+        super().__init__(**kwargs)
+        self.units = units
+        self.dropout_rate = dropout_rate
+        self.l2_reg = l2_reg
+        self.fused = fused
+        self.hidden_units = hidden_units
+        self.quantize = quantize
+        
+    def build(self, input_shape):
+        dense = FakeQuantDense if self.quantize else layers.Dense
+        self.dense1 = dense(
+            self.hidden_units or self.units, 
+            kernel_regularizer=regularizers.l2(self.l2_reg)
+        )
+        self.dense2 = dense(
+            self.units,
+            kernel_regularizer=regularizers.l2(self.l2_reg)
+        )
+        
+        if self.fused:
+            self.bn1 = self.bn2 = self.dropout1 = self.dropout2 = None
+        else:
+            self.bn1 = layers.BatchNormalization()
+            self.dropout1 = layers.Dropout(self.dropout_rate)
+            self.bn2 = layers.BatchNormalization()
+            self.dropout2 = layers.Dropout(self.dropout_rate)
+        
+        # Skip connection projection if dimensions don't match
+        if input_shape[-1] != self.units:
+            self.skip_proj = dense(self.units, use_bias=False)
+        else:
+            self.skip_proj = None
+            
+    def call(self, x, training=False):
+        # Main path
+        h = self.dense1(x)
+        if self.bn1 is not None:
+            h = self.bn1(h, training=training)
+        h = tf.nn.gelu(h)  # GELU activation (better than ReLU)
+        if self.dropout1 is not None:
+            h = self.dropout1(h, training=training)
+        
+        h = self.dense2(h)
+        if self.bn2 is not None:
+            h = self.bn2(h, training=training)
+        
+        # Skip connection
+        if self.skip_proj is not None:
+            x = self.skip_proj(x)
+        
+        # Add and activate
+        out = tf.nn.gelu(h + x)
+        if self.dropout2 is not None:
+            out = self.dropout2(out, training=training)
+        
+        return out
+    
+    def fold_into(self, fused_block):
+        """Copy this block's weights into a built fused block, folding BatchNorm."""
+        fused_block.dense1.set_weights(fold_batchnorm(*self.dense1.get_weights(), self.bn1))
+        fused_block.dense2.set_weights(fold_batchnorm(*self.dense2.get_weights(), self.bn2))
+        if self.skip_proj is not None:
+            fused_block.skip_proj.set_weights(self.skip_proj.get_weights())
+    
+    def get_config(self):
+        config = super().get_config()
+        config.update({
+            'units': self.units,
+            'dropout_rate': self.dropout_rate,
+            'l2_reg': self.l2_reg,
+            'fused': self.fused,
+            'hidden_units': self.hidden_units,
+            'quantize': self.quantize
+        })
+        return config
+
+
+def fold_batchnorm(kernel, bias, bn):
+    """
+    Fold an inference-mode BatchNormalization that directly follows a Dense
+    (no activation in between) into that Dense's kernel and bias.
+    """
+    gamma = bn.gamma.numpy() if bn.scale else 1.0
+    beta = bn.beta.numpy() if bn.center else 0.0
+    scale = gamma / np.sqrt(bn.moving_variance.numpy() + bn.epsilon)
+    shift = beta - bn.moving_mean.numpy() * scale
+    return [kernel * scale, bias * scale + shift]
+
+
+# Custom objects needed to load or clone the advanced model
+CUSTOM_OBJECTS = {
+    'FocalLoss': FocalLoss,
+    'ChannelAttention': ChannelAttention,
+    'ResidualBlock': ResidualBlock,
+    'FeatureSlice': FeatureSlice,
+    'PassThrough': PassThrough,
+    'FakeQuantDense': FakeQuantDense
+}
@@ -28,6 +28,8 @@ import json
 import os
 from collections import deque
 
+from landmark_features import normalize_hands
+
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
@@ -141,6 +143,11 @@ class LandmarkProcessor:
         self.input_size = input_size
         self.has_orientation = input_size == 130
         
+    @staticmethod
+    def landmarks_to_array(landmarks):
+        """Raw MediaPipe landmarks as a (21, 3) float32 array."""
+        return np.array([[lm.x, lm.y, lm.z] for lm in landmarks], dtype=np.float32)
+    
     def normalize_landmarks(self, landmarks):
         """
         Normalize landmarks relative to wrist position and hand size.
@@ -149,25 +156,7 @@ class LandmarkProcessor:
         if landmarks is None:
             return [0.0] * 63
         
-        coords = []
-        for lm in landmarks:
-            coords.extend([lm.x, lm.y, lm.z])
-        
-        coords = np.array(coords, dtype=np.float32)
-        
-        # Normalize relative to wrist (first landmark)
-        wrist = coords[:3].copy()
-        for i in range(21):
-            coords[i*3:i*3+3] -= wrist
-        
-        # Scale by hand size (distance from wrist to middle finger MCP)
-        middle_mcp = coords[9*3:9*3+3]  # Landmark 9
-        hand_size = np.linalg.norm(middle_mcp)
-        
-        if hand_size > 0.001:
-            coords /= hand_size
-        
-        return coords.tolist()
+        return normalize_hands(self.landmarks_to_array(landmarks)[None]).tolist()
     
     def process_hands(self, results):
         """
@@ -195,16 +184,13 @@ class LandmarkProcessor:
             hand_label = handedness.classification[0].label
             landmarks = hand_landmarks.landmark
             
-            # Normalize landmarks
-            normalized = self.normalize_landmarks(landmarks)
-            
             # Calculate orientation
             is_palm, is_left = HandOrientationCalculator.calculate_orientation(
                 landmarks, hand_label
             )
             
             hands_data.append({
-                'landmarks': normalized,
+                'coords': self.landmarks_to_array(landmarks),
                 'is_palm': is_palm,
                 'is_left': is_left,
                 'label': hand_label,
@@ -217,10 +203,16 @@ class LandmarkProcessor:
                 key=lambda h: h['raw_landmarks'][0].x
             )
         
+        # Normalize both hands in one batched call (missing hand stays zeros)
+        hands = np.zeros((2, 21, 3), dtype=np.float32)
+        for i, h in enumerate(hands_data[:2]):
+            hands[i] = h['coords']
+        normalized = normalize_hands(hands)
+        
         # Fill features for hand 1
         if len(hands_data) >= 1:
             h1 = hands_data[0]
-            features[0:63] = h1['landmarks']
+            features[0:63] = normalized[0:63]
             hand_info['hand1'] = h1['label']
             hand_info['hand1_orientation'] = 'Palm' if h1['is_palm'] == 1.0 else 'Back'
             
@@ -231,7 +223,7 @@ class LandmarkProcessor:
         # Fill features for hand 2
         if len(hands_data) >= 2:
             h2 = hands_data[1]
-            features[63:126] = h2['landmarks']
+            features[63:126] = normalized[63:126]
             hand_info['hand2'] = h2['label']
             hand_info['hand2_orientation'] = 'Palm' if h2['is_palm'] == 1.0 else 'Back'
             
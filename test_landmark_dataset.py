@@ -0,0 +1,91 @@
+"""
+Tests for the binary landmark dataset format.
+
+Usage:
+    python -m pytest -q test_landmark_dataset.py
+"""
+
+import os
+
+import numpy as np
+
+from landmark_dataset import (
+    chunked_shuffle, csv_is_newer, dataset_exists, export_csv, import_csv, load_dataset,
+    remove_dataset, save_dataset, DEFAULT_LABELS, META_FILE
+)
+
+NUM_CLASSES = 35
+PER_CLASS = 2000
+BATCH_SIZE = 64
+
+
+def class_sorted_labels():
+    """Labels grouped by class, as the extractor writes them."""
+    return np.repeat(np.arange(NUM_CLASSES), PER_CLASS).astype(np.int32)
+
+
+def mean_classes_per_batch(labels):
+    return np.mean([len(np.unique(labels[start:start + BATCH_SIZE]))
+                    for start in range(0, len(labels) - BATCH_SIZE + 1, BATCH_SIZE)])
+
+
+def test_chunked_shuffle_is_a_permutation():
+    order = chunked_shuffle(10007, 512, rng=np.random.RandomState(0))
+    assert np.array_equal(np.sort(order), np.arange(10007))
+    assert len(chunked_shuffle(0, 512)) == 0
+
+
+def test_chunked_shuffle_mixes_classes_on_class_sorted_input():
+    labels = class_sorted_labels()
+    order = chunked_shuffle(len(labels), 4096, rng=np.random.RandomState(0))
+    
+    # A chunk of 4096 class-sorted rows spans ~3 classes; batches must draw from many more
+    assert mean_classes_per_batch(labels[order]) >= 12
+    
+    # The tail of an epoch must not collapse onto the last few classes either
+    tail = labels[order[-len(order) // 8:]]
+    assert len(np.unique(tail)) >= NUM_CLASSES // 2
+
+
+def test_save_dataset_stores_rows_out_of_class_order(tmp_path):
+    labels = class_sorted_labels()
+    features = np.repeat(labels[:, None], 130, axis=1).astype(np.float32)
+    save_dataset(features, labels, DEFAULT_LABELS, str(tmp_path))
+    
+    X, y, _ = load_dataset(str(tmp_path))
+    assert np.array_equal(np.sort(y), labels)
+    assert np.all(X[:, 0] == y)  # features still paired with their labels
+    
+    # Contiguous reads (the chunked path) see a mix of classes
+    assert mean_classes_per_batch(np.asarray(y)) >= 20
+
+
+def test_import_csv_stores_rows_out_of_class_order(tmp_path):
+    labels = np.repeat(np.arange(5), 200).astype(np.int32)
+    features = np.repeat(labels[:, None], 130, axis=1).astype(np.float32)
+    save_dataset(features, labels, DEFAULT_LABELS, str(tmp_path / 'a'), shuffle=False)
+    export_csv(str(tmp_path / 'a.csv'), str(tmp_path / 'a'))
+    
+    import_csv(str(tmp_path / 'a.csv'), DEFAULT_LABELS, str(tmp_path / 'b'))
+    X, y, _ = load_dataset(str(tmp_path / 'b'))
+    assert np.array_equal(np.sort(y), labels)
+    assert np.all(X[:, 0] == y)
+    assert mean_classes_per_batch(np.asarray(y)) >= 4
+
+
+def test_csv_is_newer_flags_a_stale_binary_dataset(tmp_path):
+    labels = np.repeat(np.arange(3), 10).astype(np.int32)
+    path, csv_path = str(tmp_path / 'ds'), str(tmp_path / 'ds.csv')
+    save_dataset(np.zeros((30, 130), dtype=np.float32), labels, DEFAULT_LABELS, path)
+    export_csv(csv_path, path)
+    
+    meta_time = os.path.getmtime(os.path.join(path, META_FILE))
+    os.utime(csv_path, (meta_time - 10, meta_time - 10))
+    assert not csv_is_newer(csv_path, path)
+    
+    os.utime(csv_path, (meta_time + 10, meta_time + 10))
+    assert csv_is_newer(csv_path, path)
+    
+    remove_dataset(path)
+    assert not dataset_exists(path)
+    assert not csv_is_newer(csv_path, path)
@@ -24,15 +24,26 @@ Author: KairoAI
 import os
 import numpy as np
 import json
-import csv
+import hashlib
+import time
 import tensorflow as tf
 from tensorflow import keras
 from tensorflow.keras import layers, regularizers, Model
 from tensorflow.keras.callbacks import Callback
 from sklearn.model_selection import StratifiedKFold, train_test_split
 from sklearn.utils.class_weight import compute_class_weight
-from sklearn.metrics import classification_report, confusion_matrix
+from sklearn.metrics import classification_report, confusion_matrix, f1_score
 import math
+import multiprocessing
+import sqlite3
+
+from landmark_dataset import (
+    dataset_exists, load_dataset, remap_labels, import_csv, read_rows, chunked_shuffle, csv_is_newer
+)
+from model_layers import (
+    FocalLoss, ChannelAttention, FeatureSlice, PassThrough, FakeQuantDense,
+    ResidualBlock, fold_batchnorm, CUSTOM_OBJECTS
+)
 
 # Suppress warnings
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
@@ -42,6 +53,7 @@ os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
 # ============================================================================
 
 INPUT_CSV = "landmark_dataset_with_orientation.csv"
+INPUT_DATASET = "landmark_dataset_with_orientation"  # Binary dataset (preferred over CSV)
 OUTPUT_MODEL = "isl_model_advanced.tflite"
 OUTPUT_H5 = "isl_model_advanced.h5"
 OUTPUT_LABELS = "labels_advanced.json"
@@ -53,6 +65,16 @@ EPOCHS = 200
 BATCH_SIZE = 64
 VALIDATION_SPLIT = 0.15  # Smaller val split = more training data
 
+# Memory-mapped datasets up to this size are fully shuffled (they fit in the
+# page cache); larger ones are shuffled in windows of contiguous chunks of
+# SHUFFLE_CHUNK_SIZE rows to keep disk reads local
+SHUFFLE_IN_MEMORY_BYTES = 2 * 1024 ** 3
+SHUFFLE_CHUNK_SIZE = 32768
+
+# Input pipeline: 'tf.data' (parallel in-graph augmentation + prefetch)
+# or 'generator' (single-threaded AdvancedDataGenerator)
+INPUT_PIPELINE = 'tf.data'
+
 # Advanced config
 USE_FOCAL_LOSS = True
 FOCAL_ALPHA = 0.25
@@ -62,6 +84,12 @@ USE_CLASS_WEIGHTS = True
 USE_ATTENTION = True
 USE_RESIDUAL = True
 
+# Online hard-example mining: per-sample loss drives batch sampling,
+# CONFUSED_PAIRS stay in the mix as a prior
+USE_ONLINE_HARD_MINING = True
+OHEM_REFRESH_FRACTION = 0.25  # Fraction of training samples re-scored each epoch
+OHEM_PRIOR_WEIGHT = 0.3       # Share of sampling mass kept on the static confused pairs
+
 # Augmentation strength
 AUG_NOISE_STD = 0.03
 AUG_SCALE_RANGE = (0.85, 1.15)
@@ -70,6 +98,97 @@ AUG_SHIFT_RANGE = 0.1
 MIXUP_ALPHA = 0.3
 CUTMIX_ALPHA = 0.3
 
+# Cross-validation (--cv K): folds train in parallel worker processes, each
+# pinned to its own cores, reading the shared memory-mapped dataset
+CV_DIR = "cv_runs"
+CV_REPORT = "cv_results.json"
+
+# Hyperparameter search (--search N): trials run in parallel worker processes
+# and are stopped early by ASHA at rungs HPO_MIN_EPOCHS * HPO_ETA^k
+HPO_MIN_EPOCHS = 10
+HPO_MAX_EPOCHS = 90
+HPO_ETA = 3
+HPO_STORE = "hpo_trials.sqlite"
+HPO_DIR = "hpo_runs"
+HPO_BEST = "hpo_best.json"
+
+# Search space: a list is a categorical choice, a dict samples uniformly
+# from [low, high] (log-uniformly with 'log': True)
+SEARCH_SPACE = {
+    'FOCAL_ALPHA': {'low': 0.1, 'high': 0.5},
+    'FOCAL_GAMMA': {'low': 1.0, 'high': 3.0},
+    'AUG_NOISE_STD': {'low': 0.005, 'high': 0.05, 'log': True},
+    'AUG_SCALE_RANGE': [[0.9, 1.1], [0.85, 1.15], [0.8, 1.2]],
+    'AUG_ROTATION_RANGE': [10, 15, 20, 30],
+    'AUG_SHIFT_RANGE': {'low': 0.02, 'high': 0.15},
+    'MIXUP_ALPHA': {'low': 0.1, 'high': 0.5},
+    'CUTMIX_ALPHA': {'low': 0.1, 'high': 0.5},
+    'INITIAL_LR': {'low': 3e-4, 'high': 5e-3, 'log': True},
+    'WARMUP_EPOCHS': [3, 5, 10],
+}
+
+# Test-time augmentation (copies incl. original; reduce = 'mean' or 'geometric')
+TTA_AUGMENTS = 5
+TTA_REDUCE = 'mean'
+
+# Teacher outputs for distillation are cached here, keyed by checkpoint + data hash
+TEACHER_CACHE_DIR = "teacher_cache"
+TEACHER_BATCH_SIZE = 8192
+
+# Knowledge distillation (student exported to TFLite)
+STUDENT_HIDDEN_UNITS = (256, 128, 64)
+STUDENT_DROPOUT = 0.2
+DISTILL_TEMPERATURE = 4.0
+DISTILL_ALPHA = 0.7        # Weight of the soft (teacher) loss vs. the hard-label loss
+DISTILL_EPOCHS = 60
+DISTILL_PATIENCE = 8       # Epochs without better teacher agreement before stopping
+DISTILL_BATCH_SIZE = 256   # Clean rows per batch; each batch also carries an augmented copy
+
+# What gets shipped as TFLite: 'advanced' exports the trained model itself
+# (BatchNorm folded, Dropout stripped); 'distilled' ships a distilled student
+EXPORT_MODE = 'advanced'
+EXPORT_PARITY_SAMPLES = 2000
+EXPORT_KERAS_TOLERANCE = 1e-4   # Max abs probability diff, inference graph vs. trained model
+# Max abs probability diff, TFLite vs. trained model, per quantization mode
+EXPORT_TFLITE_TOLERANCE = {'float16': 1e-2, 'dynamic': 5e-2, 'int8': 1e-1}
+
+# Structured pruning before export (--prune): hidden Dense neurons are
+# masked on a cubic sparsity schedule while fine-tuning, then removed
+USE_PRUNING = False
+PRUNE_TARGET_SPARSITY = 0.5   # Fraction of prunable neurons removed per layer
+PRUNE_EPOCHS = 30
+PRUNE_RAMP_FRACTION = 0.66    # Share of PRUNE_EPOCHS spent ramping up sparsity
+PRUNE_MIN_UNITS = 8
+PRUNE_LR = 1e-4
+PRUNE_REPORT = "pruning_report.json"
+
+# Quantization-aware training (--qat): fine-tune the inference graph with
+# int8 fake quantization on its Dense layers, then export full-integer int8
+USE_QAT = False
+QAT_EPOCHS = 10
+QAT_LR = 1e-5
+
+# TFLite quantization: 'float16' (half-size weights, float kernels),
+# 'dynamic' (int8 weights, dynamic-range activations) or 'int8' (full-integer
+# kernels calibrated on REPRESENTATIVE_SAMPLES training rows; float I/O kept)
+TFLITE_QUANTIZATION = 'float16'
+QUANTIZATION_MODES = ('float16', 'dynamic', 'int8')
+REPRESENTATIVE_SAMPLES = 500
+QUANTIZATION_REPORT = "quantization_report.json"
+
+# Student sweep (--sweep-students): candidates distilled from the teacher and
+# the most accurate one under the single-sample latency budget is shipped
+STUDENT_CANDIDATES = [
+    (512, 256, 128, 64, 32),
+    (256, 128, 64),
+    (256, 128),
+    (128, 64),
+    (128,),
+    (64, 32),
+]
+LATENCY_BUDGET_MS = 0.25
+SWEEP_REPORT = "student_sweep.json"
+
 # Learning rate
 INITIAL_LR = 0.002
 MIN_LR = 1e-7
@@ -91,186 +210,20 @@ CONFUSED_PAIRS = [
 
 
 # ============================================================================
-# FOCAL LOSS - Better for hard examples
+# ADVANCED DATA AUGMENTATION
 # ============================================================================
 
-class FocalLoss(keras.losses.Loss):
-    """
-    Focal Loss focuses training on hard examples.
-    Reduces loss contribution from easy examples.
+class AdvancedAugmenter:
     """
-    def __init__(self, alpha=0.25, gamma=2.0, **kwargs):
-        super().__init__(**kwargs)
-        self.alpha = alpha
-        self.gamma = gamma
-    
-    def call(self, y_true, y_pred):
-        # Clip predictions to prevent log(0)
-        y_pred = tf.clip_by_value(y_pred, 1e-7, 1 - 1e-7)
-        
-        # Calculate focal loss
-        cross_entropy = -y_true * tf.math.log(y_pred)
-        weight = self.alpha * y_true * tf.pow(1 - y_pred, self.gamma)
-        focal_loss = weight * cross_entropy
-        
-        return tf.reduce_sum(focal_loss, axis=-1)
-    
-    def get_config(self):
-        config = super().get_config()
-        config.update({'alpha': self.alpha, 'gamma': self.gamma})
-        return config
-
-
-# ============================================================================
-# ATTENTION LAYER - Focus on important features
-# ============================================================================
-
-class SelfAttention(layers.Layer):
-    """Self-attention layer to focus on important landmarks."""
-    
-    def __init__(self, units, **kwargs):
-        super().__init__(**kwargs)
-        self.units = units
-        
-    def build(self, input_shape):
-        self.W_q = self.add_weight(
-            shape=(input_shape[-1], self.units),
-            initializer='glorot_uniform',
-            trainable=True,
-            name='query_weight'
-        )
-        self.W_k = self.add_weight(
-            shape=(input_shape[-1], self.units),
-            initializer='glorot_uniform',
-            trainable=True,
-            name='key_weight'
-        )
-        self.W_v = self.add_weight(
-            shape=(input_shape[-1], self.units),
-            initializer='glorot_uniform',
-            trainable=True,
-            name='value_weight'
-        )
-        
-    def call(self, x):
-        q = tf.matmul(x, self.W_q)
-        k = tf.matmul(x, self.W_k)
-        v = tf.matmul(x, self.W_v)
-        
-        # Scaled dot-product attention
-        d_k = tf.cast(tf.shape(k)[-1], tf.float32)
-        attention_scores = tf.matmul(q, k, transpose_b=True) / tf.sqrt(d_k)
-        attention_weights = tf.nn.softmax(attention_scores, axis=-1)
-        
-        output = tf.matmul(attention_weights, v)
-        return output
-    
-    def get_config(self):
-        config = super().get_config()
-        config.update({'units': self.units})
-        return config
-
-
-class ChannelAttention(layers.Layer):
-    """Channel attention - learns which features are important."""
-    
-    def __init__(self, reduction_ratio=8, **kwargs):
-        super().__init__(**kwargs)
-        self.reduction_ratio = reduction_ratio
-        
-    def build(self, input_shape):
-        channels = input_shape[-1]
-        self.dense1 = layers.Dense(channels // self.reduction_ratio, activation='relu')
-        self.dense2 = layers.Dense(channels, activation='sigmoid')
-        
-    def call(self, x):
-        # Global average pooling
-        avg_pool = tf.reduce_mean(x, axis=-1, keepdims=True)
-        max_pool = tf.reduce_max(x, axis=-1, keepdims=True)
-        
-        # Shared MLP
-        avg_out = self.dense2(self.dense1(avg_pool))
-        max_out = self.dense2(self.dense1(max_pool))
-        
-        attention = avg_out + max_out
-        return x * attention
-    
-    def get_config(self):
-        config = super().get_config()
-        config.update({'reduction_ratio': self.reduction_ratio})
-        return config
-
-
-# ============================================================================
-# RESIDUAL BLOCK
-# ============================================================================
-
-class ResidualBlock(layers.Layer):
-    """Residual block with skip connection for better gradient flow."""
+    Advanced augmentation for landmark data.
     
-    def __init__(self, units, dropout_rate=0.3, l2_reg=0.001, **kwargs):
-        super().__init__(**kwargs)
-        self.units = units
-        self.dropout_rate = dropout_rate
-        self.l2_reg = l2_reg
-        
-    def build(self, input_shape):
-        self.dense1 = layers.Dense(
-            self.units, 
-            kernel_regularizer=regularizers.l2(self.l2_reg)
-        )
-        self.bn1 = layers.BatchNormalization()
-        self.dropout1 = layers.Dropout(self.dropout_rate)
-        
-        self.dense2 = layers.Dense(
-            self.units,
-            kernel_regularizer=regularizers.l2(self.l2_reg)
-        )
-        self.bn2 = layers.BatchNormalization()
-        self.dropout2 = layers.Dropout(self.dropout_rate)
-        
-        # Skip connection projection if dimensions don't match
-        if input_shape[-1] != self.units:
-            self.skip_proj = layers.Dense(self.units, use_bias=False)
-        else:
-            self.skip_proj = None
-            
-    def call(self, x, training=False):
-        # Main path
-        h = self.dense1(x)
-        h = self.bn1(h, training=training)
-        h = tf.nn.gelu(h)  # GELU activation (better than ReLU)
-        h = self.dropout1(h, training=training)
-        
-        h = self.dense2(h)
-        h = self.bn2(h, training=training)
-        
-        # Skip connection
-        if self.skip_proj is not None:
-            x = self.skip_proj(x)
-        
-        # Add and activate
-        out = tf.nn.gelu(h + x)
-        out = self.dropout2(out, training=training)
-        
-        return out
+    All transforms are vectorized over the (B, 42, 3) landmark view of the
+    batch (2 hands × 21 landmarks × xyz); orientation features are untouched
+    except for the handedness flags in random_mirror.
+    """
     
-    def get_config(self):
-        config = super().get_config()
-        config.update({
-            'units': self.units,
-            'dropout_rate': self.dropout_rate,
-            'l2_reg': self.l2_reg
-        })
-        return config
-
-
-# ============================================================================
-# ADVANCED DATA AUGMENTATION
-# ============================================================================
-
-class AdvancedAugmenter:
-    """Advanced augmentation for landmark data."""
+    NUM_LANDMARK_FEATURES = 126
+    FINGER_TIPS = np.array([4, 8, 12, 16, 20])  # Thumb, index, middle, ring, pinky tips
     
     def __init__(self, noise_std=0.03, scale_range=(0.85, 1.15), 
                  rotation_range=20, shift_range=0.1):
@@ -278,6 +231,18 @@ class AdvancedAugmenter:
         self.scale_range = scale_range
         self.rotation_range = rotation_range
         self.shift_range = shift_range
+    
+    @classmethod
+    def _landmarks(cls, X):
+        """Copy of the landmark block as a (B, 42, 3) array."""
+        return X[:, :cls.NUM_LANDMARK_FEATURES].reshape(len(X), 42, 3).copy()
+    
+    @classmethod
+    def _with_landmarks(cls, X, lm):
+        """Copy of X with the landmark block replaced by lm (B, 42, 3)."""
+        X_out = X.copy()
+        X_out[:, :cls.NUM_LANDMARK_FEATURES] = lm.reshape(len(X), -1)
+        return X_out
         
     def add_noise(self, X):
         """Add Gaussian noise."""
@@ -295,70 +260,56 @@ class AdvancedAugmenter:
         return X_scaled
     
     def random_shift(self, X):
-        """Random translation of landmarks."""
+        """Random translation of landmarks (same shift for both hands)."""
         shift = np.random.uniform(-self.shift_range, self.shift_range, 
                                    size=(len(X), 3))
-        X_shifted = X.copy()
-        # Apply same shift to all landmarks (x, y, z)
-        for i in range(21):
-            X_shifted[:, i*3:(i+1)*3] += shift
-        # Second hand if present
-        for i in range(21, 42):
-            X_shifted[:, i*3:(i+1)*3] += shift
-        return X_shifted
+        lm = self._landmarks(X)
+        lm += shift[:, None, :]
+        return self._with_landmarks(X, lm)
     
     def random_rotation_2d(self, X):
         """Random 2D rotation around z-axis."""
         angles = np.random.uniform(-self.rotation_range, self.rotation_range, 
                                     size=len(X)) * np.pi / 180
         
-        X_rotated = X.copy()
+        cos_a = np.cos(angles)[:, None]
+        sin_a = np.sin(angles)[:, None]
         
-        for i, angle in enumerate(angles):
-            cos_a, sin_a = np.cos(angle), np.sin(angle)
-            
-            # Rotate each landmark (x, y only)
-            for j in range(42):  # 21 landmarks × 2 hands
-                if j * 3 + 2 < 126:
-                    x = X_rotated[i, j*3]
-                    y = X_rotated[i, j*3 + 1]
-                    X_rotated[i, j*3] = x * cos_a - y * sin_a
-                    X_rotated[i, j*3 + 1] = x * sin_a + y * cos_a
+        # Rotate every landmark's (x, y) with a per-sample rotation
+        lm = self._landmarks(X)
+        x, y = lm[:, :, 0].copy(), lm[:, :, 1].copy()
+        lm[:, :, 0] = x * cos_a - y * sin_a
+        lm[:, :, 1] = x * sin_a + y * cos_a
         
-        return X_rotated
+        return self._with_landmarks(X, lm)
     
     def random_mirror(self, X):
         """Randomly mirror hands (swap left/right)."""
-        X_mirrored = X.copy()
         mask = np.random.random(len(X)) < 0.3  # 30% chance
         
-        for i in np.where(mask)[0]:
-            # Mirror x coordinates
-            for j in range(42):
-                if j * 3 < 126:
-                    X_mirrored[i, j*3] = -X_mirrored[i, j*3]
-            
-            # Swap hand orientation if present
-            if X.shape[1] > 126:
-                # Swap is_left flags
-                X_mirrored[i, 127] = 1.0 - X_mirrored[i, 127] if X_mirrored[i, 127] >= 0 else -1.0
-                X_mirrored[i, 129] = 1.0 - X_mirrored[i, 129] if X_mirrored[i, 129] >= 0 else -1.0
+        # Mirror x coordinates
+        lm = self._landmarks(X)
+        lm[mask, :, 0] = -lm[mask, :, 0]
+        X_mirrored = self._with_landmarks(X, lm)
+        
+        # Swap is_left flags if present (-1.0 = no hand stays -1.0)
+        if X.shape[1] > 126:
+            flags = X_mirrored[mask][:, [127, 129]]
+            X_mirrored[np.ix_(mask, [127, 129])] = np.where(flags >= 0, 1.0 - flags, -1.0)
         
         return X_mirrored
     
     def random_finger_jitter(self, X):
         """Add extra jitter to finger tips (most variable landmarks)."""
-        X_jittered = X.copy()
-        finger_tips = [4, 8, 12, 16, 20]  # Thumb, index, middle, ring, pinky tips
+        # One (B, 3) draw per tip, shared by the same tip on both hands
+        jitter = np.random.normal(0, self.noise_std * 2, (len(self.FINGER_TIPS), len(X), 3))
+        jitter = jitter.transpose(1, 0, 2)
         
-        for tip in finger_tips:
-            jitter = np.random.normal(0, self.noise_std * 2, (len(X), 3))
-            X_jittered[:, tip*3:(tip+1)*3] += jitter
-            # Second hand
-            if (tip + 21) * 3 + 3 <= 126:
-                X_jittered[:, (tip+21)*3:(tip+22)*3] += jitter
+        lm = self._landmarks(X)
+        lm[:, self.FINGER_TIPS] += jitter
+        lm[:, self.FINGER_TIPS + 21] += jitter
         
-        return X_jittered
+        return self._with_landmarks(X, lm)
     
     def augment_batch(self, X, p=0.5):
         """Apply random augmentations to batch."""
@@ -381,6 +332,96 @@ class AdvancedAugmenter:
         return X_aug
 
 
+# ============================================================================
+# AUGMENTATION BENCHMARK
+# ============================================================================
+
+class _LoopAugmenter(AdvancedAugmenter):
+    """Original per-sample/per-landmark loop implementation, kept for benchmarking."""
+    
+    def random_shift(self, X):
+        shift = np.random.uniform(-self.shift_range, self.shift_range, 
+                                   size=(len(X), 3))
+        X_shifted = X.copy()
+        for i in range(42):
+            X_shifted[:, i*3:(i+1)*3] += shift
+        return X_shifted
+    
+    def random_rotation_2d(self, X):
+        angles = np.random.uniform(-self.rotation_range, self.rotation_range, 
+                                    size=len(X)) * np.pi / 180
+        X_rotated = X.copy()
+        for i, angle in enumerate(angles):
+            cos_a, sin_a = np.cos(angle), np.sin(angle)
+            for j in range(42):
+                x = X_rotated[i, j*3]
+                y = X_rotated[i, j*3 + 1]
+                X_rotated[i, j*3] = x * cos_a - y * sin_a
+                X_rotated[i, j*3 + 1] = x * sin_a + y * cos_a
+        return X_rotated
+    
+    def random_mirror(self, X):
+        X_mirrored = X.copy()
+        mask = np.random.random(len(X)) < 0.3
+        for i in np.where(mask)[0]:
+            for j in range(42):
+                X_mirrored[i, j*3] = -X_mirrored[i, j*3]
+            if X.shape[1] > 126:
+                X_mirrored[i, 127] = 1.0 - X_mirrored[i, 127] if X_mirrored[i, 127] >= 0 else -1.0
+                X_mirrored[i, 129] = 1.0 - X_mirrored[i, 129] if X_mirrored[i, 129] >= 0 else -1.0
+        return X_mirrored
+    
+    def random_finger_jitter(self, X):
+        X_jittered = X.copy()
+        for tip in [4, 8, 12, 16, 20]:
+            jitter = np.random.normal(0, self.noise_std * 2, (len(X), 3))
+            X_jittered[:, tip*3:(tip+1)*3] += jitter
+            X_jittered[:, (tip+21)*3:(tip+22)*3] += jitter
+        return X_jittered
+
+
+def benchmark_augmenter(n_batches=200, batch_size=BATCH_SIZE, seed=42):
+    """Compare batches/sec of the vectorized augmenter against the loop version."""
+    print("\n" + "=" * 60)
+    print("AUGMENTER BENCHMARK")
+    print("=" * 60)
+    
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(batch_size, 130)).astype(np.float32)
+    X[:, 126:] = rng.choice([-1.0, 0.0, 1.0], size=(batch_size, 4))
+    
+    kwargs = dict(noise_std=AUG_NOISE_STD, scale_range=AUG_SCALE_RANGE,
+                  rotation_range=AUG_ROTATION_RANGE, shift_range=AUG_SHIFT_RANGE)
+    
+    results = {}
+    for name, augmenter in [('loop', _LoopAugmenter(**kwargs)),
+                            ('vectorized', AdvancedAugmenter(**kwargs))]:
+        np.random.seed(seed)
+        outputs = []
+        start = time.perf_counter()
+        for _ in range(n_batches):
+            # p=1.0 with every transform applied so each op is exercised
+            X_aug = X
+            for op in (augmenter.add_noise, augmenter.random_scale,
+                       augmenter.random_rotation_2d, augmenter.random_shift,
+                       augmenter.random_finger_jitter, augmenter.random_mirror):
+                X_aug = op(X_aug)
+            outputs.append(X_aug)
+        elapsed = time.perf_counter() - start
+        results[name] = (n_batches / elapsed, np.stack(outputs))
+    
+    loop_bps, loop_out = results['loop']
+    vec_bps, vec_out = results['vectorized']
+    
+    print(f"   Batches: {n_batches} × {batch_size} samples, all transforms")
+    print(f"   Loop:       {loop_bps:,.1f} batches/sec")
+    print(f"   Vectorized: {vec_bps:,.1f} batches/sec")
+    print(f"   Speedup:    {vec_bps / loop_bps:.1f}x")
+    print(f"   Max abs diff (same seed): {np.max(np.abs(loop_out - vec_out)):.3g}")
+    
+    return loop_bps, vec_bps
+
+
 # ============================================================================
 # MIXUP AND CUTMIX
 # ============================================================================
@@ -429,40 +470,61 @@ def cutmix(X, y, alpha=0.3):
 # ============================================================================
 
 class AdvancedDataGenerator(keras.utils.Sequence):
-    """Advanced data generator with multiple augmentation techniques."""
+    """
+    Advanced data generator with multiple augmentation techniques.
+    
+    X may be an in-memory array or a read-only memmap of the full dataset;
+    `rows` selects the samples this generator serves (e.g. the training split),
+    so nothing beyond one batch is copied into RAM. With shuffle_chunk_size
+    set, shuffling is done in contiguous chunks to keep memmap reads local.
+    
+    Hard example indices are positions within `rows`. A fraction
+    hard_example_ratio of every batch is drawn from them via a sampling table
+    built once per epoch (shuffled passes over the hard set), so batches just
+    slice the table instead of sampling.
+    """
     
     def __init__(self, X, y, batch_size, augmenter, num_classes,
                  use_mixup=True, use_cutmix=True, shuffle=True,
-                 hard_example_indices=None, hard_example_ratio=0.3):
+                 hard_example_indices=None, hard_example_ratio=0.3,
+                 rows=None, shuffle_chunk_size=None):
         self.X = X
         self.y = y
+        self.rows = np.arange(len(X)) if rows is None else np.asarray(rows)
+        self.shuffle_chunk_size = shuffle_chunk_size
         self.batch_size = batch_size
         self.augmenter = augmenter
         self.num_classes = num_classes
         self.use_mixup = use_mixup
         self.use_cutmix = use_cutmix
         self.shuffle = shuffle
-        self.hard_example_indices = hard_example_indices
+        self.hard_example_indices = (
+            None if hard_example_indices is None else np.asarray(hard_example_indices, dtype=np.int64)
+        )
         self.hard_example_ratio = hard_example_ratio
-        self.indices = np.arange(len(X))
+        self.hard_per_batch = int(batch_size * hard_example_ratio)
+        self.hard_example_weights = None
+        self.hard_table = None
+        self.indices = np.arange(len(self.rows))
         self.on_epoch_end()
         
     def __len__(self):
-        return int(np.ceil(len(self.X) / self.batch_size))
+        return int(np.ceil(len(self.rows) / self.batch_size))
     
     def __getitem__(self, idx):
         batch_indices = self.indices[idx * self.batch_size:(idx + 1) * self.batch_size]
         
-        # Optionally include hard examples
-        if self.hard_example_indices is not None and len(self.hard_example_indices) > 0:
+        # Optionally replace the tail of the batch with hard examples
+        if self.hard_table is not None:
             n_hard = int(len(batch_indices) * self.hard_example_ratio)
-            hard_sample = np.random.choice(self.hard_example_indices, 
-                                           size=min(n_hard, len(self.hard_example_indices)),
-                                           replace=False)
-            batch_indices = np.concatenate([batch_indices[:-n_hard], hard_sample])
+            start = idx * self.hard_per_batch
+            hard_sample = self.hard_table[start:start + n_hard]
+            batch_indices = np.concatenate([batch_indices[:len(batch_indices) - n_hard], hard_sample])
         
-        X_batch = self.X[batch_indices].copy()
-        y_batch = self.y[batch_indices].copy()
+        # Sorted global rows: sequential reads from a memmap, one copy per batch
+        batch_rows = np.sort(self.rows[batch_indices])
+        X_batch = np.asarray(self.X[batch_rows], dtype=np.float32)
+        y_batch = self.y[batch_rows]
         
         # Apply augmentation
         X_batch = self.augmenter.augment_batch(X_batch, p=0.7)
@@ -485,7 +547,244 @@ class AdvancedDataGenerator(keras.utils.Sequence):
     
     def on_epoch_end(self):
         if self.shuffle:
-            np.random.shuffle(self.indices)
+            if self.shuffle_chunk_size:
+                self.indices = chunked_shuffle(len(self.rows), self.shuffle_chunk_size)
+            else:
+                np.random.shuffle(self.indices)
+        self.hard_table = self._build_hard_table()
+    
+    def set_hard_example_weights(self, weights):
+        """
+        Sample hard examples from a distribution over all positions in `rows`
+        (e.g. from OnlineHardExampleMiner) instead of the fixed index set.
+        """
+        self.hard_example_weights = weights
+        self.hard_table = self._build_hard_table()
+    
+    def _build_hard_table(self):
+        """Hard example positions for the whole epoch, hard_per_batch per batch."""
+        if self.hard_per_batch == 0:
+            return None
+        
+        total = len(self) * self.hard_per_batch
+        if self.hard_example_weights is not None:
+            return np.random.choice(len(self.rows), size=total, p=self.hard_example_weights)
+        
+        hard = self.hard_example_indices
+        if hard is None or len(hard) == 0:
+            return None
+        
+        passes = int(np.ceil(total / len(hard)))
+        return np.concatenate([np.random.permutation(hard) for _ in range(passes)])[:total]
+
+
+# ============================================================================
+# TF.DATA INPUT PIPELINE
+# ============================================================================
+
+def _tf_sample_beta(alpha):
+    """Sample Beta(alpha, alpha) in-graph via two Gamma draws."""
+    g1 = tf.random.gamma([], alpha)
+    g2 = tf.random.gamma([], alpha)
+    return g1 / (g1 + g2)
+
+
+def tf_mixup(X, y, alpha=0.3):
+    """In-graph mixup (see mixup())."""
+    if alpha <= 0:
+        return X, y
+    
+    lam = _tf_sample_beta(alpha)
+    indices = tf.random.shuffle(tf.range(tf.shape(X)[0]))
+    
+    X_mixed = lam * X + (1 - lam) * tf.gather(X, indices)
+    y_mixed = lam * y + (1 - lam) * tf.gather(y, indices)
+    
+    return X_mixed, y_mixed
+
+
+def tf_cutmix(X, y, alpha=0.3):
+    """In-graph CutMix (see cutmix())."""
+    if alpha <= 0:
+        return X, y
+    
+    lam = _tf_sample_beta(alpha)
+    indices = tf.random.shuffle(tf.range(tf.shape(X)[0]))
+    
+    # Determine cut size
+    feature_size = tf.shape(X)[1]
+    cut_size = tf.cast(tf.cast(feature_size, tf.float32) * (1 - lam), tf.int32)
+    cut_start = tf.random.uniform([], 0, feature_size - cut_size + 1, dtype=tf.int32)
+    
+    positions = tf.range(feature_size)
+    cut_mask = (positions >= cut_start) & (positions < cut_start + cut_size)
+    X_mixed = tf.where(cut_mask[None, :], tf.gather(X, indices), X)
+    
+    # Adjust lambda based on actual cut
+    lam = 1 - tf.cast(cut_size, tf.float32) / tf.cast(feature_size, tf.float32)
+    y_mixed = lam * y + (1 - lam) * tf.gather(y, indices)
+    
+    return X_mixed, y_mixed
+
+
+def tf_augment_batch(X, augmenter, p=0.5):
+    """
+    In-graph equivalent of AdvancedAugmenter.augment_batch for a (B, 130) batch.
+    
+    Uses the augmenter's ranges; each transform is applied to the whole batch
+    with the same probabilities as the NumPy version.
+    """
+    batch = tf.shape(X)[0]
+    lm = tf.reshape(X[:, :126], [batch, 42, 3])
+    extra = X[:, 126:]
+    
+    def maybe(prob, fn, value):
+        return tf.cond(tf.random.uniform([]) < prob, lambda: fn(value), lambda: value)
+    
+    def add_noise(lm):
+        return lm + tf.random.normal(tf.shape(lm), stddev=augmenter.noise_std)
+    
+    def random_scale(lm):
+        scale = tf.random.uniform([batch, 1, 1], *augmenter.scale_range)
+        return lm * scale
+    
+    def random_rotation_2d(lm):
+        angles = tf.random.uniform([batch, 1], -augmenter.rotation_range,
+                                   augmenter.rotation_range) * math.pi / 180
+        cos_a, sin_a = tf.cos(angles), tf.sin(angles)
+        x, y, z = lm[:, :, 0], lm[:, :, 1], lm[:, :, 2]
+        return tf.stack([x * cos_a - y * sin_a, x * sin_a + y * cos_a, z], axis=-1)
+    
+    def random_shift(lm):
+        shift = tf.random.uniform([batch, 1, 3], -augmenter.shift_range, augmenter.shift_range)
+        return lm + shift
+    
+    def random_finger_jitter(lm):
+        # (42, 5) map from each tip jitter to the same tip on both hands
+        tips = AdvancedAugmenter.FINGER_TIPS
+        tip_map = np.zeros((42, len(tips)), dtype=np.float32)
+        tip_map[tips, np.arange(len(tips))] = 1.0
+        tip_map[tips + 21, np.arange(len(tips))] = 1.0
+        jitter = tf.random.normal([batch, len(tips), 3], stddev=augmenter.noise_std * 2)
+        return lm + tf.einsum('bkc,lk->blc', jitter, tip_map)
+    
+    lm = maybe(p, add_noise, lm)
+    lm = maybe(p * 0.7, random_scale, lm)
+    lm = maybe(p * 0.5, random_rotation_2d, lm)
+    lm = maybe(p * 0.3, random_shift, lm)
+    lm = maybe(p * 0.3, random_finger_jitter, lm)
+    
+    # Mirror: flip x and swap is_left flags for ~30% of samples
+    def random_mirror(values):
+        lm, extra = values
+        mask = tf.random.uniform([batch]) < 0.3
+        sign = tf.where(mask, -1.0, 1.0)[:, None]
+        lm = tf.stack([lm[:, :, 0] * sign, lm[:, :, 1], lm[:, :, 2]], axis=-1)
+        if X.shape[-1] is not None and X.shape[-1] > 126:
+            flags = extra[:, 1::2]
+            flipped = tf.where(flags >= 0, 1.0 - flags, -1.0)
+            flags = tf.where(mask[:, None], flipped, flags)
+            extra = tf.stack([extra[:, 0], flags[:, 0], extra[:, 2], flags[:, 1]], axis=1)
+        return lm, extra
+    
+    lm, extra = maybe(p * 0.2, random_mirror, (lm, extra))
+    
+    return tf.concat([tf.reshape(lm, [batch, 126]), extra], axis=1)
+
+
+def memmap_shuffle_chunk(X):
+    """Chunk size for shuffling rows of X: None (full shuffle) unless X is a memmap too big for RAM."""
+    if isinstance(X, np.memmap) and X.nbytes > SHUFFLE_IN_MEMORY_BYTES:
+        return SHUFFLE_CHUNK_SIZE
+    return None
+
+
+def make_tf_dataset(X, y, rows, batch_size, augmenter, num_classes,
+                    use_mixup=True, use_cutmix=True,
+                    hard_example_rows=None, hard_example_ratio=0.3,
+                    shuffle_chunk_size=None, hard_example_sampler=None):
+    """
+    tf.data training pipeline equivalent to AdvancedDataGenerator.
+    
+    Elements are row indices into X; batches are gathered, augmented,
+    one-hot encoded and mixed (mixup/cutmix) in-graph with parallel map calls,
+    then prefetched so input prep overlaps with the training step.
+    A memory-mapped X is read from disk instead of being loaded into a
+    tensor, in windowed chunk-shuffle order if it exceeds SHUFFLE_IN_MEMORY_BYTES.
+    
+    hard_example_sampler, if given, is a generator function yielding hard
+    example rows indefinitely (e.g. OnlineHardExampleMiner.sample_rows) and
+    takes precedence over the fixed hard_example_rows.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    autotune = tf.data.AUTOTUNE
+    y_table = tf.constant(np.asarray(y, dtype=np.int32))
+    
+    if isinstance(X, np.memmap):
+        chunk = shuffle_chunk_size if shuffle_chunk_size is not None else memmap_shuffle_chunk(X)
+        row_ds = tf.data.Dataset.from_generator(
+            lambda: (rows[i] for i in (chunked_shuffle(len(rows), chunk) if chunk
+                                       else np.random.permutation(len(rows)))),
+            output_signature=tf.TensorSpec([], tf.int64)
+        )
+        
+        def gather(batch_rows):
+            X_batch = tf.numpy_function(
+                lambda r: read_rows(X, r).astype(np.float32), [batch_rows], tf.float32
+            )
+            return tf.reshape(X_batch, [-1, X.shape[1]]), tf.gather(y_table, batch_rows)
+    else:
+        row_ds = tf.data.Dataset.from_tensor_slices(rows).shuffle(
+            len(rows), reshuffle_each_iteration=True
+        )
+        X_table = tf.constant(np.asarray(X, dtype=np.float32))
+        
+        def gather(batch_rows):
+            return tf.gather(X_table, batch_rows), tf.gather(y_table, batch_rows)
+    
+    # Optionally oversample hard examples
+    hard_ds = None
+    if hard_example_sampler is not None:
+        hard_ds = tf.data.Dataset.from_generator(
+            hard_example_sampler, output_signature=tf.TensorSpec([], tf.int64)
+        )
+    elif hard_example_rows is not None and len(hard_example_rows) > 0:
+        hard_ds = tf.data.Dataset.from_tensor_slices(
+            np.asarray(hard_example_rows, dtype=np.int64)
+        ).shuffle(len(hard_example_rows)).repeat()
+    
+    if hard_ds is not None and hard_example_ratio > 0:
+        row_ds = tf.data.Dataset.sample_from_datasets(
+            [row_ds, hard_ds], weights=[1 - hard_example_ratio, hard_example_ratio],
+            stop_on_empty_dataset=True
+        ).take(len(rows))
+    
+    def augment(X_batch, y_batch):
+        X_batch = tf_augment_batch(X_batch, augmenter, p=0.7)
+        y_one_hot = tf.one_hot(y_batch, num_classes)
+        
+        # Apply mixup or cutmix (not both at same time)
+        if use_mixup and use_cutmix:
+            X_batch, y_one_hot = tf.cond(
+                tf.random.uniform([]) < 0.5,
+                lambda: tf_mixup(X_batch, y_one_hot, MIXUP_ALPHA),
+                lambda: tf_cutmix(X_batch, y_one_hot, CUTMIX_ALPHA)
+            )
+        elif use_mixup:
+            X_batch, y_one_hot = tf_mixup(X_batch, y_one_hot, MIXUP_ALPHA)
+        elif use_cutmix:
+            X_batch, y_one_hot = tf_cutmix(X_batch, y_one_hot, CUTMIX_ALPHA)
+        
+        return X_batch, y_one_hot
+    
+    # from_generator/sample_from_datasets hide the length; every path yields
+    # exactly len(rows) rows, so declare it for progress bars and epoch ends
+    return (row_ds
+            .batch(batch_size)
+            .apply(tf.data.experimental.assert_cardinality(math.ceil(len(rows) / batch_size)))
+            .map(gather, num_parallel_calls=autotune)
+            .map(augment, num_parallel_calls=autotune, deterministic=False)
+            .prefetch(autotune))
 
 
 # ============================================================================
@@ -506,10 +805,10 @@ def create_advanced_model(input_size):
     inputs = layers.Input(shape=(input_size,), name='input')
     
     # Split landmarks and orientation
-    landmarks = layers.Lambda(lambda x: x[:, :126], name='landmarks')(inputs)
+    landmarks = FeatureSlice(0, 126, name='landmarks')(inputs)
     
     if input_size > 126:
-        orientation = layers.Lambda(lambda x: x[:, 126:], name='orientation')(inputs)
+        orientation = FeatureSlice(126, name='orientation')(inputs)
     
     # ===== LANDMARK PROCESSING PATH =====
     
@@ -622,7 +921,7 @@ class WarmupCosineDecay(Callback):
         self.warmup_epochs = warmup_epochs
         self.total_epochs = total_epochs
         self.restarts = restarts
-        self.cycle_length = (total_epochs - warmup_epochs) // (restarts + 1)
+        self.cycle_length = max(1, (total_epochs - warmup_epochs) // (restarts + 1))
         
     def on_epoch_begin(self, epoch, logs=None):
         if epoch < self.warmup_epochs:
@@ -644,52 +943,158 @@ class WarmupCosineDecay(Callback):
         logs['lr'] = float(keras.backend.get_value(self.model.optimizer.learning_rate))
 
 
+# ============================================================================
+# ONLINE HARD-EXAMPLE MINING
+# ============================================================================
+
+class OnlineHardExampleMiner(Callback):
+    """
+    Online hard-example mining driven by per-sample loss.
+    
+    Keeps a float32 array with the latest cross-entropy of every training
+    sample. Each epoch a rotating slice (refresh_fraction) of the training set
+    is re-scored on clean inputs, and the hard-example sampling distribution
+    is rebuilt as a blend of the loss distribution and a static prior (the
+    CONFUSED_PAIRS classes). Until the first refresh only the prior is used.
+    """
+    
+    def __init__(self, X, y, rows, prior_mask, generator=None,
+                 refresh_fraction=0.25, prior_weight=0.3, batch_size=1024):
+        super().__init__()
+        self.X = X
+        self.y = y
+        self.rows = np.asarray(rows)
+        self.generator = generator
+        self.refresh_fraction = refresh_fraction
+        self.prior_weight = prior_weight
+        self.batch_size = batch_size
+        
+        self.losses = np.full(len(self.rows), np.nan, dtype=np.float32)
+        self.prior = self._normalize(np.asarray(prior_mask, dtype=np.float64))
+        self.weights = self.prior
+        
+        self._order = np.random.permutation(len(self.rows))
+        self._cursor = 0
+    
+    @staticmethod
+    def _normalize(values):
+        total = values.sum()
+        if total <= 0:
+            return np.full(len(values), 1.0 / len(values))
+        return values / total
+    
+    def _next_positions(self):
+        """Next slice of training positions to re-score (cycles through all)."""
+        n = max(1, int(len(self.rows) * self.refresh_fraction))
+        positions = np.take(self._order, np.arange(self._cursor, self._cursor + n), mode='wrap')
+        self._cursor = (self._cursor + n) % len(self.rows)
+        return np.sort(positions)
+    
+    def _score(self, positions):
+        """Per-sample cross-entropy on clean (un-augmented) inputs."""
+        losses = np.empty(len(positions), dtype=np.float32)
+        for start in range(0, len(positions), self.batch_size):
+            batch_rows = self.rows[positions[start:start + self.batch_size]]
+            probs = np.asarray(self.model.predict_on_batch(read_rows(self.X, batch_rows)))
+            p_true = probs[np.arange(len(batch_rows)), self.y[batch_rows]]
+            losses[start:start + len(batch_rows)] = -np.log(np.clip(p_true, 1e-7, 1.0))
+        return losses
+    
+    def sampling_weights(self):
+        """Blend of the per-sample loss distribution and the static prior."""
+        scored = ~np.isnan(self.losses)
+        if not scored.any():
+            return self.prior
+        
+        # Not-yet-scored samples count as average difficulty
+        filled = np.where(scored, self.losses, self.losses[scored].mean()).astype(np.float64)
+        loss_dist = self._normalize(filled)
+        return (1 - self.prior_weight) * loss_dist + self.prior_weight * self.prior
+    
+    def on_epoch_end(self, epoch, logs=None):
+        positions = self._next_positions()
+        self.losses[positions] = self._score(positions)
+        self.weights = self.sampling_weights()
+        
+        if self.generator is not None:
+            self.generator.set_hard_example_weights(self.weights)
+        
+        if (epoch + 1) % 10 == 0:
+            class_loss = np.bincount(self.y[self.rows[positions]], weights=self.losses[positions],
+                                     minlength=NUM_CLASSES)
+            class_count = np.bincount(self.y[self.rows[positions]], minlength=NUM_CLASSES)
+            hardest = np.argsort(-class_loss / np.maximum(class_count, 1))[:5]
+            print(f"   🎯 Hardest classes: {', '.join(LABELS[c] for c in hardest)}")
+    
+    def sample_rows(self, block_size=4096):
+        """Endless stream of hard-example rows from the current distribution (for tf.data)."""
+        while True:
+            positions = np.random.choice(len(self.rows), size=block_size, p=self.weights)
+            yield from self.rows[positions]
+
+
 # ============================================================================
 # LOAD DATA
 # ============================================================================
 
+def confused_pair_mask(y):
+    """Boolean mask of samples whose class appears in CONFUSED_PAIRS."""
+    hard_classes = [LABELS.index(sign) for pair in CONFUSED_PAIRS
+                    for sign in pair if sign in LABELS]
+    return np.isin(y, hard_classes)
+
+
+def open_dataset():
+    """
+    Memory-mapped features and labels remapped to LABELS (-1 for labels not
+    in LABELS), without copying anything. None if no binary dataset exists.
+    """
+    if not dataset_exists(INPUT_DATASET):
+        return None
+    X, y, meta = load_dataset(INPUT_DATASET)
+    return X, remap_labels(y, meta['labels'], LABELS)
+
+
 def load_data():
-    """Load and prepare data."""
+    """
+    Load and prepare data.
+    
+    X stays memory-mapped; rows whose label is not in LABELS keep y = -1 and
+    are excluded by row index (see split_rows()) rather than by copying X.
+    """
     print("\n" + "=" * 60)
     print("LOADING DATA")
     print("=" * 60)
     
-    if not os.path.exists(INPUT_CSV):
-        print(f"❌ ERROR: {INPUT_CSV} not found!")
+    if csv_is_newer(INPUT_CSV, INPUT_DATASET):
+        # A later CSV extraction left the binary copy behind: rebuild it
+        print(f"⚠️  {INPUT_CSV} is newer than {INPUT_DATASET}/, re-importing")
+        import_csv(INPUT_CSV, LABELS, INPUT_DATASET)
+    elif not dataset_exists(INPUT_DATASET) and os.path.exists(INPUT_CSV):
+        # Convert once to the binary format (streamed, no list-of-lists), then memmap
+        print(f"📦 Converting {INPUT_CSV} to {INPUT_DATASET}/...")
+        import_csv(INPUT_CSV, LABELS, INPUT_DATASET)
+    
+    if not dataset_exists(INPUT_DATASET):
+        print(f"❌ ERROR: neither {INPUT_DATASET}/ nor {INPUT_CSV} found!")
         return None, None, None
     
-    X, y = [], []
-    
-    with open(INPUT_CSV, 'r') as f:
-        reader = csv.reader(f)
-        next(reader)  # Skip header
-        
-        for row in reader:
-            features = [float(val) for val in row[:-1]]
-            label_str = row[-1]
-            
-            if label_str in LABELS:
-                X.append(features)
-                y.append(LABELS.index(label_str))
-    
-    X = np.array(X, dtype=np.float32)
-    y = np.array(y, dtype=np.int32)
+    # Memory-mapped binary dataset: no text parsing
+    X, y = open_dataset()
+    labelled = y >= 0
+    print(f"📦 Using binary dataset: {INPUT_DATASET}/")
     
-    print(f"✅ Loaded {len(X)} samples")
+    print(f"✅ Loaded {int(labelled.sum())} samples")
     print(f"   Feature shape: {X.shape}")
+    if not labelled.all():
+        print(f"   Skipping {int((~labelled).sum())} samples with labels not in LABELS")
     
     # Find hard examples (confused pairs)
-    hard_indices = []
-    for sign_a, sign_b in CONFUSED_PAIRS:
-        if sign_a in LABELS and sign_b in LABELS:
-            idx_a, idx_b = LABELS.index(sign_a), LABELS.index(sign_b)
-            hard_indices.extend(np.where((y == idx_a) | (y == idx_b))[0].tolist())
-    
-    hard_indices = list(set(hard_indices))
+    hard_indices = np.flatnonzero(confused_pair_mask(y))
     print(f"   Hard examples (confused pairs): {len(hard_indices)}")
     
     # Class distribution
-    unique, counts = np.unique(y, return_counts=True)
+    unique, counts = np.unique(y[labelled], return_counts=True)
     print(f"\n📊 Class distribution:")
     min_count = min(counts)
     max_count = max(counts)
@@ -704,20 +1109,46 @@ def load_data():
 # TRAINING
 # ============================================================================
 
-def train_model(model, X, y, hard_indices):
-    """Train with advanced techniques."""
+def split_rows(y):
+    """
+    Stratified train/validation split of the labelled row indices (sorted).
+    
+    Rows labelled -1 (not in LABELS) are left out. Splitting indices keeps
+    (possibly memory-mapped) features from being copied wholesale; the fixed
+    seed makes every stage see the same split.
+    """
+    labelled = np.flatnonzero(np.asarray(y) >= 0)
+    train_idx, val_idx = train_test_split(
+        np.arange(len(labelled)), test_size=VALIDATION_SPLIT, random_state=42,
+        stratify=y[labelled]
+    )
+    return np.sort(labelled[train_idx]), np.sort(labelled[val_idx])
+
+
+def train_model(model, X, y, hard_indices, pipeline=INPUT_PIPELINE, rows=None,
+                epochs=EPOCHS, checkpoint=OUTPUT_H5, latest_checkpoint='isl_model_advanced_latest.h5',
+                verbose=1, extra_callbacks=None):
+    """
+    Train with advanced techniques.
+    
+    pipeline selects the input pipeline: 'tf.data' or 'generator'.
+    Hard-example mining is enabled unless hard_indices is None; membership
+    is recomputed on the training split so positions always match it.
+    rows optionally gives an explicit (train_rows, val_rows) split (e.g. a
+    cross-validation fold); the best model is checkpointed to checkpoint.
+    extra_callbacks are appended to the standard ones.
+    """
     print("\n" + "=" * 60)
-    print(f"TRAINING FOR {EPOCHS} EPOCHS")
+    print(f"TRAINING FOR {epochs} EPOCHS")
     print("=" * 60)
     
-    # Split data
-    X_train, X_val, y_train, y_val = train_test_split(
-        X, y, test_size=VALIDATION_SPLIT, random_state=42, stratify=y
-    )
+    train_rows, val_rows = rows if rows is not None else split_rows(y)
+    y_train, y_val = y[train_rows], y[val_rows]
+    X_val = read_rows(X, val_rows)
     
     print(f"\n📊 Data split:")
-    print(f"   Training: {len(X_train)} samples")
-    print(f"   Validation: {len(X_val)} samples")
+    print(f"   Training: {len(train_rows)} samples")
+    print(f"   Validation: {len(val_rows)} samples")
     
     # Compute class weights
     class_weights = None
@@ -726,14 +1157,11 @@ def train_model(model, X, y, hard_indices):
         class_weights = dict(enumerate(weights))
         print(f"   Using class weights: min={min(weights):.2f}, max={max(weights):.2f}")
     
-    # Find hard examples in training set
-    train_hard_indices = []
+    # Find hard examples in training set (positions within train_rows)
+    train_hard_indices = np.array([], dtype=np.int64)
     if hard_indices is not None:
-        train_indices_set = set(range(len(X_train)))
-        # Map original indices to training indices (approximation)
-        for h_idx in hard_indices:
-            if h_idx < len(X_train):
-                train_hard_indices.append(h_idx)
+        train_hard_indices = np.flatnonzero(confused_pair_mask(y_train))
+        print(f"   Hard examples in training set: {len(train_hard_indices)}")
     
     # Create augmenter and generator
     augmenter = AdvancedAugmenter(
@@ -743,31 +1171,50 @@ def train_model(model, X, y, hard_indices):
         shift_range=AUG_SHIFT_RANGE
     )
     
-    train_gen = AdvancedDataGenerator(
-        X_train, y_train, BATCH_SIZE, augmenter, NUM_CLASSES,
-        use_mixup=True, use_cutmix=True,
-        hard_example_indices=train_hard_indices,
-        hard_example_ratio=0.2
-    )
+    miner = None
+    if USE_ONLINE_HARD_MINING and hard_indices is not None:
+        miner = OnlineHardExampleMiner(
+            X, y, train_rows, confused_pair_mask(y_train),
+            refresh_fraction=OHEM_REFRESH_FRACTION,
+            prior_weight=OHEM_PRIOR_WEIGHT
+        )
+    
+    if pipeline == 'tf.data':
+        train_gen = make_tf_dataset(
+            X, y, train_rows, BATCH_SIZE, augmenter, NUM_CLASSES,
+            use_mixup=True, use_cutmix=True,
+            hard_example_rows=train_rows[train_hard_indices],
+            hard_example_ratio=0.2,
+            hard_example_sampler=miner.sample_rows if miner is not None else None
+        )
+    else:
+        train_gen = AdvancedDataGenerator(
+            X, y, BATCH_SIZE, augmenter, NUM_CLASSES,
+            use_mixup=True, use_cutmix=True,
+            hard_example_indices=train_hard_indices,
+            hard_example_ratio=0.2,
+            rows=train_rows,
+            shuffle_chunk_size=memmap_shuffle_chunk(X)
+        )
+        if miner is not None:
+            miner.generator = train_gen
+    print(f"   Input pipeline: {pipeline}")
+    if miner is not None:
+        print(f"   Online hard-example mining: refresh {OHEM_REFRESH_FRACTION:.0%}/epoch, "
+              f"prior weight {OHEM_PRIOR_WEIGHT}")
     
     # Validation data
     y_val_one_hot = keras.utils.to_categorical(y_val, NUM_CLASSES)
     
     # Callbacks
     callbacks = [
-        WarmupCosineDecay(INITIAL_LR, MIN_LR, WARMUP_EPOCHS, EPOCHS, restarts=3),
+        WarmupCosineDecay(INITIAL_LR, MIN_LR, WARMUP_EPOCHS, epochs, restarts=3),
         
         keras.callbacks.ModelCheckpoint(
-            OUTPUT_H5,
+            checkpoint,
             monitor='val_accuracy',
             save_best_only=True,
-            verbose=1
-        ),
-        
-        keras.callbacks.ModelCheckpoint(
-            'isl_model_advanced_latest.h5',
-            save_best_only=False,
-            verbose=0
+            verbose=verbose
         ),
         
         # Reduce LR if stuck (backup scheduler)
@@ -776,13 +1223,13 @@ def train_model(model, X, y, hard_indices):
             factor=0.5,
             patience=15,
             min_lr=MIN_LR,
-            verbose=1
+            verbose=verbose
         ),
         
         # Progress logging
         keras.callbacks.LambdaCallback(
             on_epoch_end=lambda epoch, logs: print(
-                f"\n   📈 Epoch {epoch+1}/{EPOCHS} - "
+                f"\n   📈 Epoch {epoch+1}/{epochs} - "
                 f"acc: {logs.get('accuracy', 0)*100:.2f}% - "
                 f"val_acc: {logs.get('val_accuracy', 0)*100:.2f}% - "
                 f"lr: {logs.get('lr', 0):.6f}"
@@ -790,70 +1237,513 @@ def train_model(model, X, y, hard_indices):
         )
     ]
     
-    # Train
-    print(f"\n🚀 Starting training...")
+    if latest_checkpoint is not None:
+        callbacks.append(keras.callbacks.ModelCheckpoint(
+            latest_checkpoint,
+            save_best_only=False,
+            verbose=0
+        ))
+    
+    if miner is not None:
+        callbacks.append(miner)
+    callbacks.extend(extra_callbacks or [])
+    
+    # Train
+    print(f"\n🚀 Starting training...")
     print(f"   Techniques: Focal Loss, Attention, Residual, Mixup, CutMix")
     print(f"   Augmentation: Noise, Scale, Rotation, Shift, Mirror\n")
     
     history = model.fit(
         train_gen,
         validation_data=(X_val, y_val_one_hot),
-        epochs=EPOCHS,
+        epochs=epochs,
         callbacks=callbacks,
         class_weight=class_weights,
-        verbose=1
+        verbose=verbose
     )
     
     # Load best model
     print("\n📂 Loading best model...")
-    model = keras.models.load_model(
-        OUTPUT_H5,
-        custom_objects={
-            'FocalLoss': FocalLoss,
-            'ChannelAttention': ChannelAttention,
-            'ResidualBlock': ResidualBlock
-        }
-    )
+    model = load_advanced_model(checkpoint)
     
     return history, model, X_val, y_val
 
 
+def load_advanced_model(path=OUTPUT_H5):
+    """Load a saved advanced model with its custom objects."""
+    return keras.models.load_model(path, custom_objects=TRAINING_OBJECTS)
+
+
+# ============================================================================
+# CROSS-VALIDATION
+# ============================================================================
+
+_worker_cores = None
+
+
+def _available_cores():
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _init_training_worker(core_queue):
+    """
+    Pin this worker (CV fold or search trial) to its own block of cores and
+    size TF's thread pools to match. Runs before the worker executes any TF op.
+    """
+    global _worker_cores
+    _worker_cores = core_queue.get()
+    
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, _worker_cores)
+    tf.config.threading.set_intra_op_parallelism_threads(len(_worker_cores))
+    tf.config.threading.set_inter_op_parallelism_threads(min(2, len(_worker_cores)))
+
+
+def _training_pool(workers, what):
+    """
+    Process pool whose workers each get a disjoint block of cores.
+    
+    Spawned workers start with a fresh TF runtime so thread settings apply.
+    """
+    core_blocks = [list(block) for block in np.array_split(_available_cores(), workers)]
+    print(f"\n⚙️  {workers} parallel {what}, cores per worker: {[len(b) for b in core_blocks]}")
+    
+    ctx = multiprocessing.get_context('spawn')
+    core_queue = ctx.Queue()
+    for block in core_blocks:
+        core_queue.put([int(c) for c in block])
+    
+    return ctx.Pool(workers, initializer=_init_training_worker, initargs=(core_queue,))
+
+
+def _run_fold(task):
+    """Train and score one fold in a worker process."""
+    fold, train_rows, val_rows, epochs, pipeline = task
+    start = time.perf_counter()
+    
+    np.random.seed(42 + fold)
+    tf.random.set_seed(42 + fold)
+    keras.backend.clear_session()
+    
+    # Every worker maps the same read-only .npy files
+    X, y = open_dataset()
+    hard_indices = np.flatnonzero(confused_pair_mask(y[train_rows]))
+    
+    os.makedirs(CV_DIR, exist_ok=True)
+    checkpoint = os.path.join(CV_DIR, f"fold{fold}.h5")
+    
+    model = create_advanced_model(X.shape[1])
+    history, model, X_val, y_val = train_model(
+        model, X, y, hard_indices, pipeline=pipeline, rows=(train_rows, val_rows),
+        epochs=epochs, checkpoint=checkpoint, latest_checkpoint=None, verbose=0
+    )
+    
+    y_pred = np.argmax(predict_batched(model, X_val), axis=1)
+    cm = confusion_matrix(y_val, y_pred, labels=np.arange(NUM_CLASSES))
+    pair_confusions = {
+        f"{a}-{b}": int(cm[LABELS.index(a), LABELS.index(b)] + cm[LABELS.index(b), LABELS.index(a)])
+        for a, b in CONFUSED_PAIRS if a in LABELS and b in LABELS
+    }
+    val_acc_history = history.history.get('val_accuracy', [0.0])
+    
+    return {
+        'fold': fold,
+        'train_samples': int(len(train_rows)),
+        'val_samples': int(len(val_rows)),
+        'accuracy': float(np.mean(y_pred == y_val)),
+        'macro_f1': float(f1_score(y_val, y_pred, average='macro')),
+        'best_epoch': int(np.argmax(val_acc_history)) + 1,
+        'confused_pairs': pair_confusions,
+        'confused_pairs_total': int(sum(pair_confusions.values())),
+        'cores': list(_worker_cores) if _worker_cores is not None else None,
+        'seconds': time.perf_counter() - start,
+        'checkpoint': checkpoint,
+    }
+
+
+def cross_validate(k, workers=None, epochs=EPOCHS, pipeline=INPUT_PIPELINE):
+    """
+    Stratified K-fold cross-validation with folds trained in parallel.
+    
+    Each worker process is pinned to its own block of cores with TF intra-op
+    threads set to the block size, and reads the shared memory-mapped
+    dataset; only fold row indices are sent to it. Per-fold and aggregate
+    metrics are written to CV_REPORT.
+    """
+    print("\n" + "=" * 60)
+    print(f"{k}-FOLD CROSS-VALIDATION")
+    print("=" * 60)
+    
+    # Makes sure the binary dataset exists (converting the CSV once if needed)
+    X, y, _ = load_data()
+    if X is None:
+        return None
+    
+    labelled = np.flatnonzero(y >= 0)
+    skf = StratifiedKFold(n_splits=k, shuffle=True, random_state=42)
+    tasks = [
+        (fold, np.sort(labelled[train_idx]), np.sort(labelled[val_idx]), epochs, pipeline)
+        for fold, (train_idx, val_idx) in enumerate(skf.split(labelled, y[labelled]))
+    ]
+    
+    workers = max(1, min(workers or k, k, len(_available_cores())))
+    
+    folds = []
+    with _training_pool(workers, 'folds') as pool:
+        for result in pool.imap_unordered(_run_fold, tasks):
+            print(f"\n   ✅ Fold {result['fold'] + 1}/{k}: acc {result['accuracy']*100:.2f}%, "
+                  f"macro F1 {result['macro_f1']:.4f} ({result['seconds']/60:.1f} min)")
+            folds.append(result)
+    folds.sort(key=lambda r: r['fold'])
+    
+    accuracies = np.array([r['accuracy'] for r in folds])
+    f1s = np.array([r['macro_f1'] for r in folds])
+    summary = {
+        'k': k,
+        'epochs': epochs,
+        'workers': workers,
+        'accuracy_mean': float(accuracies.mean()),
+        'accuracy_std': float(accuracies.std()),
+        'macro_f1_mean': float(f1s.mean()),
+        'macro_f1_std': float(f1s.std()),
+        'confused_pairs_total_mean': float(np.mean([r['confused_pairs_total'] for r in folds])),
+    }
+    
+    with open(CV_REPORT, 'w') as f:
+        json.dump({'summary': summary, 'folds': folds}, f, indent=2)
+    
+    print("\n" + "-" * 60)
+    print(f"   Accuracy: {summary['accuracy_mean']*100:.2f}% ± {summary['accuracy_std']*100:.2f}%")
+    print(f"   Macro F1: {summary['macro_f1_mean']:.4f} ± {summary['macro_f1_std']:.4f}")
+    print(f"\n✅ CV report saved: {CV_REPORT}")
+    
+    return summary
+
+
+# ============================================================================
+# HYPERPARAMETER SEARCH
+# ============================================================================
+
+class TrialStore:
+    """
+    SQLite record of search trials and their rung results.
+    
+    Shared by the driver and every trial worker, so an interrupted search
+    resumes from it: finished and pruned trials are kept, unfinished ones run
+    again from scratch.
+    """
+    
+    def __init__(self, path=HPO_STORE):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=60)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS trials ("
+            " trial_id INTEGER PRIMARY KEY,"
+            " params TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " best_val_accuracy REAL,"
+            " epochs_run INTEGER)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS rungs ("
+            " trial_id INTEGER NOT NULL,"
+            " epoch INTEGER NOT NULL,"
+            " val_accuracy REAL NOT NULL,"
+            " PRIMARY KEY (trial_id, epoch))"
+        )
+        self.conn.commit()
+    
+    def add_trial(self, trial_id, params):
+        """Register a trial unless it already exists; returns its stored params."""
+        self.conn.execute(
+            "INSERT OR IGNORE INTO trials VALUES (?, ?, 'pending', NULL, NULL)",
+            (trial_id, json.dumps(params))
+        )
+        self.conn.commit()
+        row = self.conn.execute("SELECT params FROM trials WHERE trial_id = ?", (trial_id,)).fetchone()
+        return json.loads(row[0])
+    
+    def unfinished(self):
+        """(trial_id, params) of trials that still need to run."""
+        rows = self.conn.execute(
+            "SELECT trial_id, params FROM trials WHERE status NOT IN ('completed', 'pruned')"
+            " ORDER BY trial_id"
+        ).fetchall()
+        return [(trial_id, json.loads(params)) for trial_id, params in rows]
+    
+    def start(self, trial_id):
+        # A rerun forgets rung results from an interrupted attempt
+        self.conn.execute("DELETE FROM rungs WHERE trial_id = ?", (trial_id,))
+        self.conn.execute("UPDATE trials SET status = 'running' WHERE trial_id = ?", (trial_id,))
+        self.conn.commit()
+    
+    def report(self, trial_id, epoch, val_accuracy):
+        """Record a rung result and return all results recorded at that rung."""
+        self.conn.execute("INSERT OR REPLACE INTO rungs VALUES (?, ?, ?)",
+                          (trial_id, epoch, float(val_accuracy)))
+        self.conn.commit()
+        return [r[0] for r in self.conn.execute(
+            "SELECT val_accuracy FROM rungs WHERE epoch = ?", (epoch,)
+        )]
+    
+    def finish(self, trial_id, status, best_val_accuracy, epochs_run):
+        self.conn.execute(
+            "UPDATE trials SET status = ?, best_val_accuracy = ?, epochs_run = ? WHERE trial_id = ?",
+            (status, float(best_val_accuracy), int(epochs_run), trial_id)
+        )
+        self.conn.commit()
+    
+    def leaderboard(self, limit=10):
+        rows = self.conn.execute(
+            "SELECT trial_id, params, status, best_val_accuracy, epochs_run FROM trials"
+            " WHERE best_val_accuracy IS NOT NULL"
+            " ORDER BY epochs_run DESC, best_val_accuracy DESC LIMIT ?", (limit,)
+        ).fetchall()
+        return [{'trial_id': r[0], 'params': json.loads(r[1]), 'status': r[2],
+                 'best_val_accuracy': r[3], 'epochs_run': r[4]} for r in rows]
+    
+    def close(self):
+        self.conn.close()
+
+
+def sample_hyperparameters(space, rng):
+    """Draw one configuration from a SEARCH_SPACE-style dict."""
+    params = {}
+    for name, spec in space.items():
+        if isinstance(spec, list):
+            params[name] = spec[rng.integers(len(spec))]
+        elif spec.get('log'):
+            params[name] = float(np.exp(rng.uniform(np.log(spec['low']), np.log(spec['high']))))
+        else:
+            params[name] = float(rng.uniform(spec['low'], spec['high']))
+    return params
+
+
+def _apply_hyperparameters(params):
+    """Override the module-level tuning constants in this (worker) process."""
+    for name, value in params.items():
+        if name not in globals():
+            raise ValueError(f"Unknown hyperparameter '{name}'")
+        globals()[name] = tuple(value) if isinstance(value, list) else value
+
+
+def asha_rungs(min_epochs=HPO_MIN_EPOCHS, max_epochs=HPO_MAX_EPOCHS, eta=HPO_ETA):
+    """Epochs at which trials are compared: min_epochs * eta^k below max_epochs."""
+    rungs, epoch = [], min_epochs
+    while epoch < max_epochs:
+        rungs.append(epoch)
+        epoch *= eta
+    return rungs
+
+
+class AshaPruning(Callback):
+    """
+    Asynchronous successive halving, stopping-based.
+    
+    At each rung epoch the trial records its val_accuracy in the shared
+    store and keeps training only if it is within the top 1/eta of all
+    results recorded at that rung so far.
+    """
+    
+    def __init__(self, store, trial_id, rungs, eta=HPO_ETA):
+        super().__init__()
+        self.store = store
+        self.trial_id = trial_id
+        self.rungs = set(rungs)
+        self.eta = eta
+        self.pruned = False
+    
+    def on_epoch_end(self, epoch, logs=None):
+        if epoch + 1 not in self.rungs:
+            return
+        val_accuracy = (logs or {}).get('val_accuracy', 0.0)
+        results = self.store.report(self.trial_id, epoch + 1, val_accuracy)
+        
+        # Too few results at this rung to rank against: keep going
+        if len(results) < self.eta:
+            return
+        cutoff = np.sort(results)[::-1][max(1, len(results) // self.eta) - 1]
+        if val_accuracy < cutoff:
+            print(f"\n   ✂️  Trial {self.trial_id} pruned at epoch {epoch + 1} "
+                  f"(val_acc {val_accuracy*100:.2f}% < {cutoff*100:.2f}%)")
+            self.pruned = True
+            self.model.stop_training = True
+
+
+def _run_trial(task):
+    """Train one search trial in a worker process."""
+    trial_id, params, train_rows, val_rows, store_path, max_epochs, pipeline = task
+    
+    _apply_hyperparameters(params)
+    np.random.seed(1000 + trial_id)
+    tf.random.set_seed(1000 + trial_id)
+    keras.backend.clear_session()
+    
+    store = TrialStore(store_path)
+    store.start(trial_id)
+    
+    X, y = open_dataset()
+    hard_indices = np.flatnonzero(confused_pair_mask(y[train_rows]))
+    
+    os.makedirs(HPO_DIR, exist_ok=True)
+    pruner = AshaPruning(store, trial_id, asha_rungs(max_epochs=max_epochs))
+    
+    model = create_advanced_model(X.shape[1])
+    history, _, _, _ = train_model(
+        model, X, y, hard_indices, pipeline=pipeline, rows=(train_rows, val_rows),
+        epochs=max_epochs, checkpoint=os.path.join(HPO_DIR, f"trial{trial_id}.h5"),
+        latest_checkpoint=None, verbose=0, extra_callbacks=[pruner]
+    )
+    
+    val_acc_history = history.history.get('val_accuracy', [0.0])
+    status = 'pruned' if pruner.pruned else 'completed'
+    store.finish(trial_id, status, max(val_acc_history), len(val_acc_history))
+    store.close()
+    
+    return trial_id, status, max(val_acc_history), len(val_acc_history)
+
+
+def hyperparameter_search(n_trials, workers=None, space=None, store_path=HPO_STORE,
+                          max_epochs=HPO_MAX_EPOCHS, pipeline=INPUT_PIPELINE, seed=42):
+    """
+    Parallel hyperparameter search with ASHA early stopping.
+    
+    Trials sample the tuning constants from space (default SEARCH_SPACE) and
+    train concurrently in pinned worker processes on the shared
+    memory-mapped dataset. Everything is persisted in store_path, so running
+    the same command again resumes an interrupted search. The best completed
+    configuration is written to HPO_BEST.
+    """
+    print("\n" + "=" * 60)
+    print(f"HYPERPARAMETER SEARCH ({n_trials} trials, ASHA rungs {asha_rungs(max_epochs=max_epochs)})")
+    print("=" * 60)
+    
+    space = space or SEARCH_SPACE
+    
+    X, y, _ = load_data()
+    if X is None:
+        return None
+    train_rows, val_rows = split_rows(y)
+    
+    store = TrialStore(store_path)
+    rng = np.random.default_rng(seed)
+    for trial_id in range(n_trials):
+        # Draw every trial in order so a resumed search samples the same configs
+        store.add_trial(trial_id, sample_hyperparameters(space, rng))
+    pending = store.unfinished()
+    
+    print(f"\n📋 {n_trials - len(pending)} trials already done, {len(pending)} to run")
+    
+    if pending:
+        workers = max(1, min(workers or len(pending), len(pending), len(_available_cores())))
+        tasks = [(trial_id, params, train_rows, val_rows, store_path, max_epochs, pipeline)
+                 for trial_id, params in pending]
+        with _training_pool(workers, 'trials') as pool:
+            for trial_id, status, best, epochs_run in pool.imap_unordered(_run_trial, tasks):
+                print(f"\n   {'✅' if status == 'completed' else '✂️ '} Trial {trial_id}: {status} "
+                      f"after {epochs_run} epochs, best val_acc {best*100:.2f}%")
+    
+    leaderboard = store.leaderboard()
+    store.close()
+    
+    print("\n" + "-" * 60)
+    print("LEADERBOARD")
+    print("-" * 60)
+    for entry in leaderboard:
+        print(f"   Trial {entry['trial_id']:>3} [{entry['status']:<9}] "
+              f"{entry['epochs_run']:>4} epochs  val_acc {entry['best_val_accuracy']*100:.2f}%")
+    
+    if leaderboard:
+        with open(HPO_BEST, 'w') as f:
+            json.dump(leaderboard[0], f, indent=2)
+        print(f"\n✅ Best configuration saved: {HPO_BEST}")
+    
+    return leaderboard
+
+
 # ============================================================================
 # TEST-TIME AUGMENTATION
 # ============================================================================
 
-def predict_with_tta(model, X, n_augments=5):
-    """Prediction with test-time augmentation."""
+def predict_batched(model, X, batch_size=8192):
+    """
+    Predict with a Keras model or a tf.lite.Interpreter.
+    
+    The TFLite input tensor is resized to the batch size so large inputs run
+    in a few invokes instead of one per sample.
+    """
+    X = np.asarray(X, dtype=np.float32)
+    
+    if not isinstance(model, tf.lite.Interpreter):
+        return model.predict(X, batch_size=batch_size, verbose=0)
+    
+    input_index = model.get_input_details()[0]['index']
+    output_index = model.get_output_details()[0]['index']
+    
+    outputs = []
+    current_size = None
+    for start in range(0, len(X), batch_size):
+        batch = X[start:start + batch_size]
+        if len(batch) != current_size:
+            model.resize_tensor_input(input_index, [len(batch), X.shape[1]])
+            model.allocate_tensors()
+            current_size = len(batch)
+        model.set_tensor(input_index, batch)
+        model.invoke()
+        outputs.append(model.get_tensor(output_index).copy())
+    
+    return np.concatenate(outputs)
+
+
+def predict_with_tta(model, X, n_augments=5, reduce='mean', batch_size=8192):
+    """
+    Prediction with test-time augmentation.
+    
+    The original inputs and n_augments - 1 augmented copies are stacked into a
+    single (n_augments * N, features) array and predicted in one batched pass
+    (Keras model or tf.lite.Interpreter), then reduced across copies with
+    'mean' or 'geometric' (geometric mean, renormalized).
+    """
     augmenter = AdvancedAugmenter(noise_std=0.01, scale_range=(0.95, 1.05))
     
-    predictions = []
+    X = np.asarray(X, dtype=np.float32)
+    copies = [X] + [augmenter.augment_batch(X, p=0.5) for _ in range(n_augments - 1)]
+    X_all = np.concatenate(copies).astype(np.float32)
     
-    # Original prediction
-    predictions.append(model.predict(X, verbose=0))
+    predictions = predict_batched(model, X_all, batch_size).reshape(n_augments, len(X), -1)
     
-    # Augmented predictions
-    for _ in range(n_augments - 1):
-        X_aug = augmenter.augment_batch(X, p=0.5)
-        predictions.append(model.predict(X_aug, verbose=0))
+    if reduce == 'geometric':
+        log_pred = np.mean(np.log(np.clip(predictions, 1e-7, 1.0)), axis=0)
+        geo = np.exp(log_pred - log_pred.max(axis=1, keepdims=True))
+        return geo / geo.sum(axis=1, keepdims=True)
     
-    # Average predictions
-    avg_pred = np.mean(predictions, axis=0)
-    return avg_pred
+    return np.mean(predictions, axis=0)
 
 
 # ============================================================================
 # EVALUATION
 # ============================================================================
 
-def evaluate_model(model, X_val, y_val, use_tta=True):
-    """Comprehensive evaluation."""
+def evaluate_model(model, X_val, y_val, use_tta=True, title="EVALUATION"):
+    """
+    Comprehensive evaluation of a Keras model or a tf.lite.Interpreter
+    (e.g. the exported int8 artifact).
+    """
     print("\n" + "=" * 60)
-    print("EVALUATION")
+    print(title)
     print("=" * 60)
     
     # Standard prediction
     y_val_one_hot = keras.utils.to_categorical(y_val, NUM_CLASSES)
-    val_loss, val_acc = model.evaluate(X_val, y_val_one_hot, verbose=0)
+    if isinstance(model, tf.lite.Interpreter):
+        probs = predict_batched(model, X_val)
+        val_acc = float(np.mean(np.argmax(probs, axis=1) == y_val))
+        val_loss = float(np.mean(-np.log(np.clip(probs[np.arange(len(y_val)), y_val], 1e-7, 1.0))))
+    else:
+        val_loss, val_acc = model.evaluate(X_val, y_val_one_hot, verbose=0)
     
     print(f"\n📈 Standard Evaluation:")
     print(f"   Validation Accuracy: {val_acc*100:.2f}%")
@@ -862,12 +1752,12 @@ def evaluate_model(model, X_val, y_val, use_tta=True):
     # TTA prediction
     if use_tta:
         print(f"\n🔄 Test-Time Augmentation (TTA):")
-        tta_pred = predict_with_tta(model, X_val, n_augments=5)
+        tta_pred = predict_with_tta(model, X_val, n_augments=TTA_AUGMENTS, reduce=TTA_REDUCE)
         tta_classes = np.argmax(tta_pred, axis=1)
         tta_acc = np.mean(tta_classes == y_val)
         print(f"   TTA Accuracy: {tta_acc*100:.2f}%")
     else:
-        tta_pred = model.predict(X_val, verbose=0)
+        tta_pred = predict_batched(model, X_val)
         tta_classes = np.argmax(tta_pred, axis=1)
     
     # Classification report
@@ -904,80 +1794,1021 @@ def evaluate_model(model, X_val, y_val, use_tta=True):
 
 
 # ============================================================================
-# CONVERT TO TFLITE
+# TEACHER LOGIT CACHE
+# ============================================================================
+
+def _hash_file(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _hash_features(X, chunk_rows=65536):
+    """Fingerprint a (possibly memory-mapped) feature matrix, streamed in chunks."""
+    digest = hashlib.sha256(str(X.shape).encode())
+    for start in range(0, len(X), chunk_rows):
+        digest.update(np.ascontiguousarray(X[start:start + chunk_rows], dtype=np.float32))
+    return digest.hexdigest()
+
+
+def logit_model(model):
+    """
+    Sub-model returning a softmax classifier's pre-softmax logits.
+    
+    The final softmax Dense is re-applied without its activation (sharing
+    the trained weights); a separate final softmax layer is simply skipped.
+    """
+    final = model.layers[-1]
+    if isinstance(final, layers.Dense) and getattr(final.activation, '__name__', None) == 'softmax':
+        logits_layer = layers.Dense.from_config(
+            {**final.get_config(), 'activation': 'linear', 'name': f"{final.name}_logits"}
+        )
+        logits = logits_layer(final.input)
+        logits_layer.set_weights(final.get_weights())
+        return Model(model.inputs, logits)
+    if isinstance(final, (layers.Softmax, layers.Activation)):
+        return Model(model.inputs, final.input)
+    raise ValueError(f"Final layer '{final.name}' is not a softmax output")
+
+
+def teacher_logits(model, X, checkpoint=OUTPUT_H5, cache_dir=TEACHER_CACHE_DIR,
+                   batch_size=TEACHER_BATCH_SIZE):
+    """
+    Teacher pre-softmax logits for every row of X, cached on disk.
+    
+    The logits are read from the final layer before its softmax (see
+    logit_model), so temperature scaling in DistillationLoss starts from the
+    exact values rather than clipped log-probabilities. The cache file is
+    keyed by the checkpoint hash and a fingerprint of X, so re-running export
+    or trying another student skips the teacher pass. Returns a read-only
+    memmap of shape (N, NUM_CLASSES).
+    """
+    logits_model = logit_model(model)
+    
+    if checkpoint is None or not os.path.exists(checkpoint):
+        print("   ⚠️  No teacher checkpoint on disk, computing teacher outputs uncached")
+        return _predict_logits(logits_model, X, batch_size)
+    
+    key = f"{_hash_file(checkpoint)[:16]}_{_hash_features(X)[:16]}"
+    cache_path = os.path.join(cache_dir, f"teacher_logits_{key}.npy")
+    
+    if os.path.exists(cache_path):
+        print(f"   ♻️  Reusing cached teacher outputs: {cache_path}")
+        return np.load(cache_path, mmap_mode='r')
+    
+    print(f"   🧠 Computing teacher outputs for {len(X)} samples...")
+    os.makedirs(cache_dir, exist_ok=True)
+    
+    # Write to a temporary file first so an interrupted run never leaves a bad cache
+    tmp_path = cache_path + '.tmp'
+    out = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32,
+                                    shape=(len(X), logits_model.output_shape[-1]))
+    for start in range(0, len(X), batch_size):
+        batch = np.asarray(X[start:start + batch_size], dtype=np.float32)
+        out[start:start + len(batch)] = logits_model.predict(batch, batch_size=batch_size, verbose=0)
+    out.flush()
+    del out
+    os.replace(tmp_path, cache_path)
+    
+    print(f"   💾 Cached teacher outputs: {cache_path}")
+    return np.load(cache_path, mmap_mode='r')
+
+
+def _predict_logits(logits_model, X, batch_size):
+    return np.concatenate([
+        logits_model.predict(np.asarray(X[start:start + batch_size], dtype=np.float32),
+                             batch_size=batch_size, verbose=0)
+        for start in range(0, len(X), batch_size)
+    ]).astype(np.float32)
+
+
+# ============================================================================
+# KNOWLEDGE DISTILLATION
 # ============================================================================
 
-def convert_to_tflite(model):
-    """Convert to optimized TFLite."""
+class DistillationLoss(keras.losses.Loss):
+    """
+    Temperature-scaled KL to the teacher blended with hard-label cross-entropy.
+    
+    y_true packs [one-hot labels | teacher pre-softmax logits] along the last
+    axis. y_pred is the student's softmax output; its log is used as the
+    student logits, which gives the same temperature-scaled distribution.
+    """
+    def __init__(self, num_classes, temperature=4.0, alpha=0.7, **kwargs):
+        super().__init__(**kwargs)
+        self.num_classes = num_classes
+        self.temperature = temperature
+        self.alpha = alpha
+    
+    def call(self, y_true, y_pred):
+        hard = y_true[:, :self.num_classes]
+        teacher_logits = y_true[:, self.num_classes:]
+        student_logits = tf.math.log(tf.clip_by_value(y_pred, 1e-7, 1.0))
+        
+        t = self.temperature
+        teacher_soft = tf.nn.softmax(teacher_logits / t)
+        student_log_soft = tf.nn.log_softmax(student_logits / t)
+        kl = tf.reduce_sum(
+            teacher_soft * (tf.math.log(tf.clip_by_value(teacher_soft, 1e-7, 1.0)) - student_log_soft),
+            axis=-1
+        )
+        
+        # t^2 keeps soft-target gradients on the same scale as the hard loss
+        hard_loss = -tf.reduce_sum(hard * student_logits, axis=-1)
+        return self.alpha * (t ** 2) * kl + (1 - self.alpha) * hard_loss
+    
+    def get_config(self):
+        config = super().get_config()
+        config.update({
+            'num_classes': self.num_classes,
+            'temperature': self.temperature,
+            'alpha': self.alpha
+        })
+        return config
+
+
+# Custom objects for cloning or loading models compiled by this script: the
+# model layers plus losses only used in training (a distilled student keeps
+# DistillationLoss in its compile config)
+TRAINING_OBJECTS = {**CUSTOM_OBJECTS, 'DistillationLoss': DistillationLoss}
+
+
+class TeacherAgreementStopping(Callback):
+    """
+    Early stopping on top-1 agreement between student and teacher.
+    
+    Agreement is measured on held-out samples after every epoch and logged as
+    'teacher_agreement'; the best student weights are restored at the end.
+    """
+    
+    def __init__(self, X_val, teacher_classes, patience=8):
+        super().__init__()
+        self.X_val = X_val
+        self.teacher_classes = teacher_classes
+        self.patience = patience
+        self.best = -1.0
+        self.best_weights = None
+        self.wait = 0
+    
+    def on_epoch_end(self, epoch, logs=None):
+        logs = logs if logs is not None else {}
+        student_classes = np.argmax(
+            self.model.predict(self.X_val, batch_size=TEACHER_BATCH_SIZE, verbose=0), axis=1
+        )
+        agreement = float(np.mean(student_classes == self.teacher_classes))
+        logs['teacher_agreement'] = agreement
+        
+        if agreement > self.best:
+            self.best = agreement
+            self.best_weights = self.model.get_weights()
+            self.wait = 0
+        else:
+            self.wait += 1
+            if self.wait >= self.patience:
+                print(f"\n   ⏹️  Teacher agreement stalled at {self.best*100:.2f}%, stopping")
+                self.model.stop_training = True
+    
+    def on_train_end(self, logs=None):
+        if self.best_weights is not None:
+            self.model.set_weights(self.best_weights)
+
+
+def create_student_model(input_size, hidden_units=STUDENT_HIDDEN_UNITS, dropout=STUDENT_DROPOUT):
+    """Plain Dense/BatchNorm/Dropout stack that converts cleanly to TFLite."""
+    student = keras.Sequential([layers.Input(shape=(input_size,))])
+    for units in hidden_units:
+        student.add(layers.Dense(units, activation='gelu'))
+        student.add(layers.BatchNormalization())
+        student.add(layers.Dropout(dropout))
+    student.add(layers.Dense(NUM_CLASSES, activation='softmax'))
+    return student
+
+
+def distillation_batches(teacher, X, y, rows, cached_logits, augmenter, batch_size):
+    """
+    Endless transfer-set stream for distillation.
+    
+    Each batch holds batch_size clean rows, whose teacher outputs come from
+    the on-disk cache, plus an augmented copy of the same rows labelled by
+    the teacher on the fly.
+    """
+    teacher_logit_fn = logit_model(teacher)
+    chunk = memmap_shuffle_chunk(X)
+    while True:
+        order = (chunked_shuffle(len(rows), chunk) if chunk
+                 else np.random.permutation(len(rows)))
+        for start in range(0, len(order) - batch_size + 1, batch_size):
+            batch_rows = np.sort(rows[order[start:start + batch_size]])
+            X_clean = np.asarray(X[batch_rows], dtype=np.float32)
+            X_aug = augmenter.augment_batch(X_clean, p=0.5).astype(np.float32)
+            
+            aug_logits = teacher_logit_fn(X_aug, training=False).numpy()
+            hard = keras.utils.to_categorical(y[batch_rows], NUM_CLASSES)
+            
+            X_batch = np.concatenate([X_clean, X_aug])
+            y_batch = np.concatenate([
+                np.concatenate([hard, cached_logits[batch_rows]], axis=1),
+                np.concatenate([hard, aug_logits], axis=1)
+            ]).astype(np.float32)
+            yield X_batch, y_batch
+
+
+def distill_student(teacher, X, y, train_rows, val_rows, student=None,
+                    checkpoint=OUTPUT_H5, epochs=DISTILL_EPOCHS,
+                    temperature=DISTILL_TEMPERATURE, alpha=DISTILL_ALPHA,
+                    batch_size=DISTILL_BATCH_SIZE, patience=DISTILL_PATIENCE):
+    """
+    Distill the teacher into a small student.
+    
+    The student is trained on the training rows (clean + augmented) with
+    DistillationLoss, and stopped early once its top-1 agreement with the
+    teacher on the validation rows stops improving.
+    
+    Returns:
+        student: trained Keras model (softmax output)
+        agreement: best teacher agreement on the validation rows
+    """
+    if student is None:
+        student = create_student_model(X.shape[1])
+    
+    logits = teacher_logits(teacher, X, checkpoint=checkpoint)
+    X_val = read_rows(X, val_rows)
+    teacher_val_classes = np.argmax(logits[val_rows], axis=1)
+    
+    augmenter = AdvancedAugmenter(
+        noise_std=AUG_NOISE_STD,
+        scale_range=AUG_SCALE_RANGE,
+        rotation_range=AUG_ROTATION_RANGE,
+        shift_range=AUG_SHIFT_RANGE
+    )
+    
+    student.compile(
+        optimizer=keras.optimizers.Adam(learning_rate=1e-3),
+        loss=DistillationLoss(NUM_CLASSES, temperature=temperature, alpha=alpha)
+    )
+    
+    stopper = TeacherAgreementStopping(X_val, teacher_val_classes, patience=patience)
+    steps = max(1, len(train_rows) // batch_size)
+    
+    print(f"   Student: {student.count_params():,} parameters")
+    print(f"   Temperature: {temperature}, soft weight: {alpha}, {steps} steps/epoch")
+    
+    student.fit(
+        distillation_batches(teacher, X, y, train_rows, logits, augmenter, batch_size),
+        steps_per_epoch=steps,
+        epochs=epochs,
+        callbacks=[
+            stopper,
+            keras.callbacks.ReduceLROnPlateau(
+                monitor='loss', factor=0.5, patience=max(1, patience // 2), min_lr=MIN_LR
+            )
+        ],
+        verbose=2
+    )
+    
+    print(f"   ✅ Teacher agreement: {stopper.best*100:.2f}%")
+    return student, stopper.best
+
+
+# ============================================================================
+# INFERENCE EXPORT
+# ============================================================================
+
+def _layer_consumers(model):
+    """
+    Top-level graph connectivity.
+    
+    Returns:
+        producers: dict id(input tensor) -> producing layer
+        consumers: dict layer name -> layers consuming its output
+    """
+    if isinstance(model, keras.Sequential):
+        # A Sequential is a plain chain
+        chain = [layer for layer in model.layers if not isinstance(layer, keras.layers.InputLayer)]
+        producers = {id(b.input): a for a, b in zip(chain, chain[1:])}
+        consumers = {a.name: [b] for a, b in zip(chain, chain[1:])}
+        consumers[chain[-1].name] = []
+        return producers, consumers
+    
+    producers = {id(layer.output): layer for layer in model.layers}
+    consumers = {layer.name: [] for layer in model.layers}
+    for layer in model.layers:
+        if isinstance(layer, keras.layers.InputLayer):
+            continue
+        inputs = layer.input if isinstance(layer.input, (list, tuple)) else [layer.input]
+        for tensor in inputs:
+            producer = producers.get(id(tensor))
+            if producer is not None:
+                consumers[producer.name].append(layer)
+    return producers, consumers
+
+
+def plan_batchnorm_folds(model):
+    """
+    Find top-level BatchNormalization layers that can be folded away.
+    
+    - backward: Dense (linear activation) -> BN, the BN being the Dense's only
+      consumer; the BN is folded into that Dense's kernel and bias
+    - forward: BN -> [Dropout ->] Dense, every consumer a Dense; the BN is
+      folded into the consumers' kernels and biases (covers the
+      Dense(gelu) -> BN -> Dropout -> Dense pattern)
+    
+    Returns:
+        backward: dict Dense name -> BN layer
+        forward: dict Dense name -> BN layer
+    """
+    producers, consumers = _layer_consumers(model)
+    output_ids = {id(t) for t in model.outputs}
+    
+    def effective_consumers(layer):
+        # Dropout is an identity at inference time, look through it
+        result = []
+        for consumer in consumers[layer.name]:
+            if isinstance(consumer, layers.Dropout):
+                if id(consumer.output) in output_ids:
+                    return None
+                nested = effective_consumers(consumer)
+                if nested is None:
+                    return None
+                result.extend(nested)
+            else:
+                result.append(consumer)
+        return result
+    
+    backward, forward = {}, {}
+    for layer in model.layers:
+        if not isinstance(layer, layers.BatchNormalization):
+            continue
+        axis = layer.axis[0] if isinstance(layer.axis, (list, tuple)) else layer.axis
+        if axis not in (-1, len(layer.input.shape) - 1):
+            continue
+        
+        producer = producers.get(id(layer.input))
+        if (isinstance(producer, layers.Dense) and producer.use_bias and
+                producer.get_config()['activation'] == 'linear' and
+                len(consumers[producer.name]) == 1 and producer.name not in backward):
+            backward[producer.name] = layer
+            continue
+        
+        targets = None if id(layer.output) in output_ids else effective_consumers(layer)
+        if targets and all(isinstance(t, layers.Dense) and t.use_bias and
+                           t.name not in forward for t in targets):
+            for target in targets:
+                forward[target.name] = layer
+    
+    return backward, forward
+
+
+def fold_batchnorm_forward(bn, kernel, bias):
+    """Fold an inference-mode BatchNormalization that feeds a Dense into it."""
+    gamma = bn.gamma.numpy() if bn.scale else 1.0
+    beta = bn.beta.numpy() if bn.center else 0.0
+    scale = gamma / np.sqrt(bn.moving_variance.numpy() + bn.epsilon)
+    shift = beta - bn.moving_mean.numpy() * scale
+    return [kernel * scale[:, None], bias + shift @ kernel]
+
+
+def build_inference_model(model, verbose=True):
+    """
+    Lean inference-only copy of a trained model for export.
+    
+    Dropout layers and foldable BatchNorm layers (see plan_batchnorm_folds())
+    become identities, with the BatchNorm scale and shift folded into the
+    neighbouring Dense kernels and biases. Every ResidualBlock is rebuilt in
+    its fused form. All other weights are copied unchanged.
+    """
+    backward, forward = plan_batchnorm_folds(model)
+    folded = {bn.name for bn in backward.values()} | {bn.name for bn in forward.values()}
+    
+    def clone_layer(layer):
+        if isinstance(layer, layers.Dropout) or layer.name in folded:
+            return PassThrough(name=layer.name)
+        if isinstance(layer, ResidualBlock):
+            return ResidualBlock.from_config({**layer.get_config(), 'fused': True})
+        return layer.__class__.from_config(layer.get_config())
+    
+    with keras.utils.custom_object_scope(TRAINING_OBJECTS):
+        inference_model = keras.models.clone_model(model, clone_function=clone_layer)
+    fused_layers = {layer.name: layer for layer in inference_model.layers}
+    
+    for layer in model.layers:
+        target = fused_layers[layer.name]
+        if isinstance(layer, ResidualBlock):
+            layer.fold_into(target)
+        elif isinstance(layer, layers.Dense) and (layer.name in forward or layer.name in backward):
+            weights = layer.get_weights()
+            if layer.name in forward:
+                weights = fold_batchnorm_forward(forward[layer.name], *weights)
+            if layer.name in backward:
+                weights = fold_batchnorm(*weights, backward[layer.name])
+            target.set_weights(weights)
+        elif layer.weights and layer.name not in folded:
+            target.set_weights(layer.get_weights())
+    
+    if verbose:
+        num_dropout = sum(isinstance(layer, layers.Dropout) for layer in model.layers)
+        num_blocks = sum(isinstance(layer, ResidualBlock) for layer in model.layers)
+        print(f"   Folded {len(folded)} BatchNorm into Dense, removed {num_dropout} Dropout, "
+              f"fused {num_blocks} residual blocks")
+        print(f"   Parameters: {model.count_params():,} -> {inference_model.count_params():,}")
+    
+    return inference_model
+
+
+def check_export_parity(reference, candidate, X_sample, tolerance):
+    """
+    Max absolute output difference between two models (Keras or
+    tf.lite.Interpreter) on X_sample; prints the result.
+    
+    Returns:
+        (passed, max_abs_diff)
+    """
+    diff = float(np.max(np.abs(predict_batched(reference, X_sample) -
+                               predict_batched(candidate, X_sample))))
+    passed = diff <= tolerance
+    print(f"   {'✅' if passed else '❌'} Max abs diff: {diff:.3g} (tolerance {tolerance:g})")
+    return passed, diff
+
+
+# ============================================================================
+# STRUCTURED PRUNING
+# ============================================================================
+
+# Per-feature layers a neuron can pass through on its way to the next Dense
+_NEURON_PASSTHROUGH = (layers.BatchNormalization, layers.Dropout, layers.Activation, PassThrough)
+
+
+def prunable_neuron_groups(model):
+    """
+    Dense layers whose output neurons can be removed outright.
+    
+    A top-level Dense qualifies when its output only reaches other Dense
+    layers through per-feature layers (BatchNorm, Dropout, activations), so
+    dropping a neuron means dropping a kernel column, the matching BatchNorm
+    entries and the matching consumer kernel rows. The inner layer of every
+    ResidualBlock qualifies too; its outer layer feeds the skip addition and
+    is left alone.
+    
+    Returns a list of dicts with 'name', 'producer' (Dense), 'bns'
+    (BatchNorm layers on the path), 'consumers' (Dense layers) and, for
+    residual blocks, 'block'.
+    """
+    producers, consumers = _layer_consumers(model)
+    output_ids = {id(t) for t in model.outputs}
+    groups = []
+    
+    for layer in model.layers:
+        if isinstance(layer, ResidualBlock):
+            groups.append({
+                'name': f"{layer.name}/dense1", 'producer': layer.dense1,
+                'bns': [layer.bn1] if layer.bn1 is not None else [],
+                'consumers': [layer.dense2], 'block': layer
+            })
+            continue
+        if not isinstance(layer, layers.Dense) or id(layer.output) in output_ids:
+            continue
+        
+        bns, frontier, targets = [], [layer], []
+        while frontier:
+            current = frontier.pop()
+            for consumer in consumers[current.name]:
+                if isinstance(consumer, layers.Dense):
+                    targets.append(consumer)
+                elif isinstance(consumer, _NEURON_PASSTHROUGH) and len(consumers[current.name]) == 1:
+                    if isinstance(consumer, layers.BatchNormalization):
+                        bns.append(consumer)
+                    frontier.append(consumer)
+                else:
+                    targets = None
+                    break
+            if targets is None:
+                break
+        
+        if targets and len(layer.input.shape) == 2:
+            groups.append({'name': layer.name, 'producer': layer, 'bns': bns, 'consumers': targets})
+    
+    return groups
+
+
+def neuron_scores(group):
+    """
+    Importance of each neuron in a group: incoming kernel column norm times
+    BatchNorm scale times outgoing kernel row norm.
+    """
+    kernel = group['producer'].kernel.numpy()
+    score = np.linalg.norm(kernel, axis=0)
+    for bn in group['bns']:
+        gamma = bn.gamma.numpy() if bn.scale else 1.0
+        score = score * np.abs(gamma / np.sqrt(bn.moving_variance.numpy() + bn.epsilon))
+    for consumer in group['consumers']:
+        score = score * np.linalg.norm(consumer.kernel.numpy(), axis=1)
+    return score
+
+
+class NeuronPruner(Callback):
+    """
+    Masks the least important neurons of every prunable group on a cubic
+    sparsity schedule (0 -> target over ramp_epochs).
+    
+    A pruned neuron has its incoming column, bias and outgoing consumer rows
+    zeroed after every batch, so it has no effect on the output and removing
+    it afterwards (see slice_pruned_model()) is exact.
+    """
+    
+    def __init__(self, groups, target_sparsity, ramp_epochs, min_units=PRUNE_MIN_UNITS):
+        super().__init__()
+        self.groups = groups
+        self.target_sparsity = target_sparsity
+        self.ramp_epochs = max(1, ramp_epochs)
+        self.min_units = min_units
+        self.masks = {g['name']: np.ones(g['producer'].units, dtype=np.float32) for g in groups}
+    
+    def sparsity_at(self, epoch):
+        progress = min(1.0, (epoch + 1) / self.ramp_epochs)
+        return self.target_sparsity * (1 - (1 - progress) ** 3)
+    
+    def on_epoch_begin(self, epoch, logs=None):
+        sparsity = self.sparsity_at(epoch)
+        for group in self.groups:
+            units = group['producer'].units
+            n_keep = max(self.min_units, units - int(round(units * sparsity)))
+            
+            # Already-pruned neurons stay pruned (their score is zero)
+            score = neuron_scores(group) * self.masks[group['name']]
+            mask = np.zeros(units, dtype=np.float32)
+            mask[np.argsort(score)[::-1][:n_keep]] = 1.0
+            self.masks[group['name']] = mask
+        self.apply_masks()
+    
+    def on_train_batch_end(self, batch, logs=None):
+        self.apply_masks()
+    
+    def on_epoch_end(self, epoch, logs=None):
+        logs = logs if logs is not None else {}
+        logs['sparsity'] = self.sparsity_at(epoch)
+    
+    def apply_masks(self):
+        for group in self.groups:
+            mask = self.masks[group['name']]
+            producer = group['producer']
+            producer.kernel.assign(producer.kernel * mask[None, :])
+            if producer.use_bias:
+                producer.bias.assign(producer.bias * mask)
+            for consumer in group['consumers']:
+                consumer.kernel.assign(consumer.kernel * mask[:, None])
+    
+    def kept_units(self):
+        return {name: np.flatnonzero(mask) for name, mask in self.masks.items()}
+
+
+def slice_pruned_model(model, groups, keep):
+    """
+    Physically remove pruned neurons: rebuild the model with narrower Dense
+    layers (and ResidualBlock inner layers) and copy the kept weights.
+    """
+    out_keep, in_keep, bn_keep, block_keep = {}, {}, {}, {}
+    for group in groups:
+        kept = keep[group['name']]
+        if 'block' in group:
+            block_keep[group['block'].name] = kept
+            continue
+        out_keep[group['producer'].name] = kept
+        for bn in group['bns']:
+            bn_keep[bn.name] = kept
+        for consumer in group['consumers']:
+            in_keep[consumer.name] = kept
+    
+    def clone_layer(layer):
+        config = layer.get_config()
+        if layer.name in out_keep:
+            config['units'] = len(out_keep[layer.name])
+        if layer.name in block_keep:
+            config['hidden_units'] = len(block_keep[layer.name])
+        return layer.__class__.from_config(config)
+    
+    with keras.utils.custom_object_scope(TRAINING_OBJECTS):
+        pruned = keras.models.clone_model(model, clone_function=clone_layer)
+    new_layers = {layer.name: layer for layer in pruned.layers}
+    
+    def slice_dense(dense, rows=None, cols=None):
+        weights = dense.get_weights()
+        kernel = weights[0]
+        if rows is not None:
+            kernel = kernel[rows]
+        if cols is not None:
+            kernel = kernel[:, cols]
+        sliced = [kernel]
+        if dense.use_bias:
+            sliced.append(weights[1] if cols is None else weights[1][cols])
+        return sliced
+    
+    for layer in model.layers:
+        target = new_layers[layer.name]
+        if layer.name in block_keep:
+            kept = block_keep[layer.name]
+            target.dense1.set_weights(slice_dense(layer.dense1, cols=kept))
+            target.bn1.set_weights([w[kept] for w in layer.bn1.get_weights()])
+            target.dense2.set_weights(slice_dense(layer.dense2, rows=kept))
+            target.bn2.set_weights(layer.bn2.get_weights())
+            if layer.skip_proj is not None:
+                target.skip_proj.set_weights(layer.skip_proj.get_weights())
+        elif isinstance(layer, layers.Dense):
+            target.set_weights(slice_dense(layer, rows=in_keep.get(layer.name),
+                                           cols=out_keep.get(layer.name)))
+        elif layer.name in bn_keep:
+            target.set_weights([w[bn_keep[layer.name]] for w in layer.get_weights()])
+        elif layer.weights:
+            target.set_weights(layer.get_weights())
+    
+    return pruned
+
+
+def _export_stats(model, X_val, y_val):
+    tflite_model = keras_to_tflite(build_inference_model(model, verbose=False))
+    stats = measure_tflite(tflite_model, X_val, y_val)
+    stats['params'] = int(model.count_params())
+    return stats
+
+
+def prune_model(model, X, y, train_rows, val_rows, target_sparsity=PRUNE_TARGET_SPARSITY,
+                epochs=PRUNE_EPOCHS):
+    """
+    Structured neuron pruning with fine-tuning.
+    
+    Fine-tunes a copy of the model with focal loss and the training
+    augmenter while NeuronPruner ramps sparsity up to target_sparsity, then
+    slices the pruned neurons out. Parameter count, TFLite size, interpreter
+    latency and validation accuracy before/after go to PRUNE_REPORT.
+    
+    Returns the slimmed Keras model.
+    """
     print("\n" + "=" * 60)
-    print("CONVERTING TO TFLITE")
+    print(f"STRUCTURED PRUNING (target sparsity {target_sparsity:.0%})")
     print("=" * 60)
     
-    # Save a version without custom objects for TFLite conversion
-    # Re-create model with standard layers
-    print("   Creating export-friendly model...")
-    
-    input_size = model.input_shape[1]
-    
-    # Simple export model (without custom layers)
-    export_model = keras.Sequential([
-        layers.Input(shape=(input_size,)),
-        layers.Dense(512, activation='gelu'),
-        layers.BatchNormalization(),
-        layers.Dropout(0.4),
-        layers.Dense(256, activation='gelu'),
-        layers.BatchNormalization(),
-        layers.Dropout(0.3),
-        layers.Dense(128, activation='gelu'),
-        layers.BatchNormalization(),
-        layers.Dropout(0.3),
-        layers.Dense(64, activation='gelu'),
-        layers.BatchNormalization(),
-        layers.Dropout(0.2),
-        layers.Dense(32, activation='gelu'),
-        layers.BatchNormalization(),
-        layers.Dropout(0.2),
-        layers.Dense(NUM_CLASSES, activation='softmax')
-    ])
-    
-    export_model.compile(
-        optimizer='adam',
-        loss='categorical_crossentropy',
+    X_val, y_val = read_rows(X, val_rows), y[val_rows]
+    before = _export_stats(model, X_val, y_val)
+    
+    # Fine-tune a copy so the trained model stays intact
+    with keras.utils.custom_object_scope(TRAINING_OBJECTS):
+        working = keras.models.clone_model(model)
+    working.set_weights(model.get_weights())
+    working.compile(
+        optimizer=keras.optimizers.Adam(learning_rate=PRUNE_LR),
+        loss=FocalLoss(alpha=FOCAL_ALPHA, gamma=FOCAL_GAMMA),
         metrics=['accuracy']
     )
     
-    # Knowledge distillation: train export model on advanced model's predictions
-    print("   Performing knowledge distillation...")
+    groups = prunable_neuron_groups(working)
+    if not groups:
+        print("   ⚠️  No prunable Dense layers found, skipping")
+        return model
+    print(f"   Prunable layers: {', '.join(g['name'] for g in groups)}")
     
-    # Load training data for distillation
-    X_all, y_all, _ = load_data()
-    if X_all is not None:
-        # Get soft labels from advanced model
-        soft_labels = model.predict(X_all, verbose=0)
-        
-        # Train export model
-        export_model.fit(
-            X_all, soft_labels,
-            epochs=20,
-            batch_size=64,
-            verbose=1
-        )
+    augmenter = AdvancedAugmenter(
+        noise_std=AUG_NOISE_STD,
+        scale_range=AUG_SCALE_RANGE,
+        rotation_range=AUG_ROTATION_RANGE,
+        shift_range=AUG_SHIFT_RANGE
+    )
+    train_ds = make_tf_dataset(X, y, train_rows, BATCH_SIZE, augmenter, NUM_CLASSES,
+                               use_mixup=False, use_cutmix=False)
+    pruner = NeuronPruner(groups, target_sparsity, int(epochs * PRUNE_RAMP_FRACTION))
+    
+    working.fit(
+        train_ds,
+        validation_data=(X_val, keras.utils.to_categorical(y_val, NUM_CLASSES)),
+        epochs=epochs,
+        callbacks=[pruner],
+        verbose=2
+    )
     
-    # Convert to TFLite
-    print("\n   Converting to TFLite...")
-    converter = tf.lite.TFLiteConverter.from_keras_model(export_model)
+    pruned = slice_pruned_model(working, groups, pruner.kept_units())
+    
+    # Slicing must be exact: masked neurons had no effect on the output
+    diff = float(np.max(np.abs(predict_batched(working, X_val[:EXPORT_PARITY_SAMPLES]) -
+                               predict_batched(pruned, X_val[:EXPORT_PARITY_SAMPLES]))))
+    print(f"   Slicing max abs diff: {diff:.3g}")
+    
+    after = _export_stats(pruned, X_val, y_val)
+    
+    print("\n" + "-" * 60)
+    print(f"   {'':<12} {'Params':>10} {'Size KB':>9} {'Latency ms':>11} {'Val acc':>8}")
+    for label, r in (('Before', before), ('After', after)):
+        print(f"   {label:<12} {r['params']:>10,} {r['size_kb']:>9.1f} "
+              f"{r['latency_ms']:>11.4f} {r['accuracy']*100:>7.2f}%")
+    print("-" * 60)
+    for group in groups:
+        print(f"   {group['name']}: {group['producer'].units} -> {len(pruner.kept_units()[group['name']])} units")
+    
+    with open(PRUNE_REPORT, 'w') as f:
+        json.dump({
+            'target_sparsity': target_sparsity,
+            'epochs': epochs,
+            'layers': {g['name']: [int(g['producer'].units), int(len(pruner.kept_units()[g['name']]))]
+                       for g in groups},
+            'slice_max_abs_diff': diff,
+            'before': before,
+            'after': after
+        }, f, indent=2)
+    print(f"\n✅ Pruning report saved: {PRUNE_REPORT}")
+    
+    return pruned
+
+
+# ============================================================================
+# QUANTIZATION-AWARE TRAINING
+# ============================================================================
+
+def _dense_weights(dense):
+    return [dense.kernel.numpy()] + ([dense.bias.numpy()] if dense.use_bias else [])
+
+
+def _copy_dense_pairs(source, target):
+    """Copy kernel/bias between matching Dense layers of two model copies
+    (top level and inside residual blocks); other layers copy all weights."""
+    target_layers = {layer.name: layer for layer in target.layers}
+    for layer in source.layers:
+        other = target_layers[layer.name]
+        if isinstance(layer, ResidualBlock):
+            for name in ('dense1', 'dense2', 'skip_proj'):
+                if getattr(layer, name) is not None:
+                    dense = getattr(other, name)
+                    for var, value in zip([dense.kernel] + ([dense.bias] if dense.use_bias else []),
+                                          _dense_weights(getattr(layer, name))):
+                        var.assign(value)
+            for name in ('bn1', 'bn2'):
+                if getattr(layer, name) is not None:
+                    getattr(other, name).set_weights(getattr(layer, name).get_weights())
+        elif isinstance(layer, layers.Dense):
+            for var, value in zip([other.kernel] + ([other.bias] if other.use_bias else []),
+                                  _dense_weights(layer)):
+                var.assign(value)
+        elif layer.weights:
+            other.set_weights(layer.get_weights())
+
+
+def quantization_aware_finetune(export_model, X, y, train_rows, val_rows, epochs=QAT_EPOCHS):
+    """
+    Quantization-aware fine-tuning of an inference graph (see
+    build_inference_model()).
+    
+    Every Dense (top level and inside residual blocks) is swapped for
+    FakeQuantDense and the model is fine-tuned with focal loss and the
+    training augmenter; remaining BatchNorm layers are frozen. The trained
+    weights are copied back into a plain copy of export_model, ready for
+    full-integer conversion.
+    
+    Returns the fine-tuned plain Keras model.
+    """
+    print("\n" + "=" * 60)
+    print(f"QUANTIZATION-AWARE TRAINING ({epochs} epochs)")
+    print("=" * 60)
+    
+    def clone_layer(layer):
+        config = layer.get_config()
+        if type(layer) is layers.Dense:
+            return FakeQuantDense.from_config(config)
+        if isinstance(layer, ResidualBlock):
+            return ResidualBlock.from_config({**config, 'quantize': True})
+        return layer.__class__.from_config(config)
+    
+    with keras.utils.custom_object_scope(TRAINING_OBJECTS):
+        qat_model = keras.models.clone_model(export_model, clone_function=clone_layer)
+        plain_model = keras.models.clone_model(export_model)
+    _copy_dense_pairs(export_model, qat_model)
+    
+    for layer in qat_model.layers:
+        if isinstance(layer, layers.BatchNormalization):
+            layer.trainable = False
+    
+    qat_model.compile(
+        optimizer=keras.optimizers.Adam(learning_rate=QAT_LR),
+        loss=FocalLoss(alpha=FOCAL_ALPHA, gamma=FOCAL_GAMMA),
+        metrics=['accuracy']
+    )
+    
+    augmenter = AdvancedAugmenter(
+        noise_std=AUG_NOISE_STD,
+        scale_range=AUG_SCALE_RANGE,
+        rotation_range=AUG_ROTATION_RANGE,
+        shift_range=AUG_SHIFT_RANGE
+    )
+    train_ds = make_tf_dataset(X, y, train_rows, BATCH_SIZE, augmenter, NUM_CLASSES,
+                               use_mixup=False, use_cutmix=False)
+    X_val, y_val = read_rows(X, val_rows), y[val_rows]
+    
+    qat_model.fit(
+        train_ds,
+        validation_data=(X_val, keras.utils.to_categorical(y_val, NUM_CLASSES)),
+        epochs=epochs,
+        verbose=2
+    )
+    
+    _copy_dense_pairs(qat_model, plain_model)
+    return plain_model
+
+
+# ============================================================================
+# CONVERT TO TFLITE
+# ============================================================================
+
+def representative_dataset(X, rows, num_samples=REPRESENTATIVE_SAMPLES, seed=42):
+    """
+    Calibration generator for full-integer quantization: yields single
+    training samples (sorted for sequential reads from a memmap).
+    """
+    rng = np.random.default_rng(seed)
+    sample_rows = np.sort(rng.choice(rows, size=min(num_samples, len(rows)), replace=False))
+    samples = read_rows(X, sample_rows).astype(np.float32)
+    
+    def generator():
+        for sample in samples:
+            yield [sample[None]]
+    
+    return generator
+
+
+def keras_to_tflite(model, quantization='float16', representative_data=None):
+    """
+    Convert a Keras model to a TFLite flatbuffer.
+    
+    quantization is one of QUANTIZATION_MODES. 'int8' needs
+    representative_data (see representative_dataset()); inputs and outputs
+    stay float32 so the app's interface is unchanged.
+    """
+    if quantization not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization '{quantization}', expected one of {QUANTIZATION_MODES}")
+    
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
     converter.optimizations = [tf.lite.Optimize.DEFAULT]
     
-    # Quantization for smaller size
-    converter.target_spec.supported_types = [tf.float16]
+    if quantization == 'float16':
+        # Quantization for smaller size
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == 'int8':
+        if representative_data is None:
+            raise ValueError("int8 quantization needs a representative dataset")
+        converter.representative_dataset = representative_data
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
     
-    tflite_model = converter.convert()
+    return converter.convert()
+
+
+def measure_tflite(tflite_model, X_val, y_val, n_runs=500, warmup=50):
+    """
+    Size, single-sample latency and accuracy of a TFLite model on the local
+    CPU interpreter.
+    
+    Returns a dict with 'size_kb', 'latency_ms' (median invoke time for one
+    sample, as the app runs it) and 'accuracy' on (X_val, y_val).
+    """
+    interpreter = tf.lite.Interpreter(model_content=tflite_model)
+    input_index = interpreter.get_input_details()[0]['index']
+    interpreter.resize_tensor_input(input_index, [1, X_val.shape[1]])
+    interpreter.allocate_tensors()
+    
+    samples = np.asarray(X_val[:n_runs + warmup], dtype=np.float32)
+    timings = []
+    for i in range(n_runs + warmup):
+        interpreter.set_tensor(input_index, samples[i % len(samples)][None])
+        start = time.perf_counter()
+        interpreter.invoke()
+        if i >= warmup:
+            timings.append(time.perf_counter() - start)
+    
+    predictions = predict_batched(tf.lite.Interpreter(model_content=tflite_model), X_val)
+    
+    return {
+        'size_kb': len(tflite_model) / 1024,
+        'latency_ms': float(np.median(timings) * 1000),
+        'accuracy': float(np.mean(np.argmax(predictions, axis=1) == y_val)),
+    }
+
+
+def convert_to_tflite(model, X, y, train_rows, val_rows, checkpoint=OUTPUT_H5,
+                      hidden_units=STUDENT_HIDDEN_UNITS, quantization=TFLITE_QUANTIZATION,
+                      compare_quantization=False, export_mode=EXPORT_MODE,
+                      prune_sparsity=None, qat=False):
+    """
+    Convert to optimized TFLite.
+    
+    export_mode 'advanced' ships the trained model itself; 'distilled'
+    distills an export-friendly student from the training arrays already in
+    memory (or memory-mapped), with the teacher's outputs taken from the
+    on-disk teacher cache. Either way the model goes through its lean
+    inference graph (see build_inference_model()) and numeric parity against
+    Keras is checked before anything is written.
+    
+    prune_sparsity, if given, runs structured pruning (see prune_model())
+    on the model before export. qat fine-tunes the inference graph with
+    quantization-aware training and exports full-integer int8; the TFLite
+    parity check is then against the fine-tuned Keras model.
+    
+    compare_quantization also builds every quantization mode and reports
+    accuracy/latency against float16 before saving the requested one.
+    
+    Returns the TFLite flatbuffer, or None if the parity check fails.
+    """
+    print("\n" + "=" * 60)
+    print("CONVERTING TO TFLITE")
+    print("=" * 60)
+    
+    parity_rows = val_rows[:EXPORT_PARITY_SAMPLES]
+    
+    if export_mode == 'advanced':
+        source_model = model
+    else:
+        # Knowledge distillation into a model without custom layers
+        print("   Performing knowledge distillation...")
+        student = create_student_model(X.shape[1], hidden_units)
+        source_model, _ = distill_student(model, X, y, train_rows, val_rows,
+                                          student=student, checkpoint=checkpoint)
+    
+    if prune_sparsity:
+        source_model = prune_model(source_model, X, y, train_rows, val_rows,
+                                   target_sparsity=prune_sparsity)
+    
+    print("\n   Building inference graph (BatchNorm folded, Dropout stripped)...")
+    export_model = build_inference_model(source_model)
+    
+    print("\n📋 Parity: inference graph vs. Keras model")
+    passed, _ = check_export_parity(source_model, export_model, read_rows(X, parity_rows),
+                                    EXPORT_KERAS_TOLERANCE)
+    if not passed:
+        print("❌ ERROR: inference graph does not match the Keras model, not exporting")
+        return None
+    
+    reference_model = source_model
+    if qat:
+        export_model = quantization_aware_finetune(export_model, X, y, train_rows, val_rows)
+        reference_model = export_model
+        quantization = 'int8'
     
-    with open(OUTPUT_MODEL, 'wb') as f:
+    # Convert to TFLite
+    representative_data = representative_dataset(X, train_rows)
+    if compare_quantization:
+        builds = compare_quantization_modes(export_model, representative_data,
+                                            read_rows(X, val_rows), y[val_rows])
+        tflite_model = builds[quantization]
+    else:
+        print(f"\n   Converting to TFLite ({quantization})...")
+        tflite_model = keras_to_tflite(export_model, quantization, representative_data)
+    
+    print(f"\n📋 Parity: TFLite ({quantization}) vs. Keras model")
+    interpreter = tf.lite.Interpreter(model_content=tflite_model)
+    passed, _ = check_export_parity(reference_model, interpreter, read_rows(X, parity_rows),
+                                    EXPORT_TFLITE_TOLERANCE[quantization])
+    if not passed:
+        print("❌ ERROR: TFLite output drifted from the Keras model, not exporting")
+        return None
+    
+    return save_tflite(tflite_model)
+
+
+def compare_quantization_modes(export_model, representative_data, X_val, y_val,
+                               modes=QUANTIZATION_MODES):
+    """
+    Build export_model in each quantization mode and report size, latency and
+    accuracy side by side against the float16 build.
+    
+    Returns:
+        dict mapping mode to TFLite flatbuffer
+    """
+    print("\n" + "-" * 60)
+    print("QUANTIZATION COMPARISON")
+    print("-" * 60)
+    
+    builds, results = {}, {}
+    for mode in modes:
+        print(f"   Converting ({mode})...")
+        builds[mode] = keras_to_tflite(export_model, mode, representative_data)
+        results[mode] = measure_tflite(builds[mode], X_val, y_val)
+    
+    baseline = results.get('float16')
+    print(f"\n   {'Mode':<10} {'Size KB':>9} {'Latency ms':>11} {'Val acc':>8} {'Δ acc':>8} {'Speedup':>8}")
+    for mode, r in results.items():
+        delta = (r['accuracy'] - baseline['accuracy']) * 100 if baseline else 0.0
+        speedup = baseline['latency_ms'] / r['latency_ms'] if baseline else 1.0
+        print(f"   {mode:<10} {r['size_kb']:>9.1f} {r['latency_ms']:>11.4f} "
+              f"{r['accuracy']*100:>7.2f}% {delta:>+7.2f}% {speedup:>7.2f}x")
+    
+    with open(QUANTIZATION_REPORT, 'w') as f:
+        json.dump({'baseline': 'float16', 'modes': results}, f, indent=2)
+    print(f"\n✅ Quantization report saved: {QUANTIZATION_REPORT}")
+    
+    return builds
+
+
+def save_tflite(tflite_model, path=OUTPUT_MODEL):
+    """Write a TFLite model and print its size and I/O shapes."""
+    with open(path, 'wb') as f:
         f.write(tflite_model)
     
-    print(f"\n✅ TFLite model saved: {OUTPUT_MODEL}")
-    print(f"   Size: {os.path.getsize(OUTPUT_MODEL) / 1024:.2f} KB")
+    print(f"\n✅ TFLite model saved: {path}")
+    print(f"   Size: {os.path.getsize(path) / 1024:.2f} KB")
     
     # Verify
     print("\n📋 Verifying TFLite model...")
@@ -993,11 +2824,124 @@ def convert_to_tflite(model):
     return tflite_model
 
 
+# ============================================================================
+# STUDENT ARCHITECTURE SWEEP
+# ============================================================================
+
+def pareto_front(results):
+    """
+    Indices of results not dominated on (size_kb, latency_ms, accuracy):
+    no other candidate is at least as small, as fast and as accurate while
+    being strictly better on one of them.
+    """
+    front = []
+    for i, a in enumerate(results):
+        dominated = any(
+            b['size_kb'] <= a['size_kb'] and b['latency_ms'] <= a['latency_ms'] and
+            b['accuracy'] >= a['accuracy'] and
+            (b['size_kb'] < a['size_kb'] or b['latency_ms'] < a['latency_ms'] or
+             b['accuracy'] > a['accuracy'])
+            for j, b in enumerate(results) if j != i
+        )
+        if not dominated:
+            front.append(i)
+    return front
+
+
+def sweep_students(teacher, X, y, train_rows, val_rows, candidates=STUDENT_CANDIDATES,
+                   latency_budget_ms=LATENCY_BUDGET_MS, checkpoint=OUTPUT_H5,
+                   quantization=TFLITE_QUANTIZATION):
+    """
+    Distill every candidate student, measure it as TFLite and pick one.
+    
+    The pick is the most accurate Pareto-optimal candidate within the latency
+    budget, or the fastest candidate if none fits. The table is written to
+    SWEEP_REPORT.
+    
+    Returns:
+        (tflite_model, result) for the selected candidate
+    """
+    print("\n" + "=" * 60)
+    print("STUDENT ARCHITECTURE SWEEP")
+    print("=" * 60)
+    
+    X_val, y_val = read_rows(X, val_rows), y[val_rows]
+    representative_data = representative_dataset(X, train_rows)
+    results, models = [], []
+    
+    for hidden_units in candidates:
+        label = '-'.join(str(u) for u in hidden_units)
+        print(f"\n🧪 Student {label}")
+        student = create_student_model(X.shape[1], hidden_units)
+        student, agreement = distill_student(teacher, X, y, train_rows, val_rows,
+                                             student=student, checkpoint=checkpoint)
+        
+        tflite_model = keras_to_tflite(build_inference_model(student, verbose=False),
+                                       quantization, representative_data)
+        result = measure_tflite(tflite_model, X_val, y_val)
+        result.update({
+            'hidden_units': list(hidden_units),
+            'params': int(student.count_params()),
+            'teacher_agreement': agreement,
+        })
+        results.append(result)
+        models.append(tflite_model)
+    
+    front = pareto_front(results)
+    within_budget = [i for i in front if results[i]['latency_ms'] <= latency_budget_ms]
+    if within_budget:
+        chosen = max(within_budget, key=lambda i: results[i]['accuracy'])
+    else:
+        print(f"\n   ⚠️  No candidate within {latency_budget_ms} ms, picking the fastest")
+        chosen = min(range(len(results)), key=lambda i: results[i]['latency_ms'])
+    
+    print("\n" + "-" * 78)
+    print(f"   {'Student':<22} {'Params':>9} {'Size KB':>9} {'Latency ms':>11} "
+          f"{'Val acc':>8} {'Agree':>7}")
+    print("-" * 78)
+    for i, r in enumerate(results):
+        marker = '★' if i == chosen else ('◆' if i in front else ' ')
+        print(f" {marker} {'-'.join(map(str, r['hidden_units'])):<22} {r['params']:>9,} "
+              f"{r['size_kb']:>9.1f} {r['latency_ms']:>11.4f} "
+              f"{r['accuracy']*100:>7.2f}% {r['teacher_agreement']*100:>6.2f}%")
+    print("-" * 78)
+    print(f"   ◆ Pareto-optimal   ★ selected (latency budget {latency_budget_ms} ms)")
+    
+    for i, r in enumerate(results):
+        r['pareto'] = i in front
+        r['selected'] = i == chosen
+    with open(SWEEP_REPORT, 'w') as f:
+        json.dump({'latency_budget_ms': latency_budget_ms, 'quantization': quantization,
+                   'candidates': results}, f, indent=2)
+    print(f"\n✅ Sweep report saved: {SWEEP_REPORT}")
+    
+    return models[chosen], results[chosen]
+
+
+def run_student_sweep(latency_budget_ms=LATENCY_BUDGET_MS, quantization=TFLITE_QUANTIZATION):
+    """Sweep students against the saved teacher and export the selected one."""
+    X, y, _ = load_data()
+    if X is None:
+        return
+    if not os.path.exists(OUTPUT_H5):
+        print(f"❌ ERROR: teacher checkpoint {OUTPUT_H5} not found, train first")
+        return
+    
+    teacher = load_advanced_model(OUTPUT_H5)
+    train_rows, val_rows = split_rows(y)
+    
+    tflite_model, result = sweep_students(teacher, X, y, train_rows, val_rows,
+                                          latency_budget_ms=latency_budget_ms,
+                                          quantization=quantization)
+    print(f"\n🎯 Selected student: {'-'.join(map(str, result['hidden_units']))}")
+    save_tflite(tflite_model)
+
+
 # ============================================================================
 # SAVE CONFIG
 # ============================================================================
 
-def save_config(val_acc):
+def save_config(val_acc, quantization=TFLITE_QUANTIZATION, export_mode=EXPORT_MODE, epochs=EPOCHS):
     """Save configuration."""
     config = {
         'labels': LABELS,
@@ -1005,7 +2949,7 @@ def save_config(val_acc):
         'input_size': 130,
         'validation_accuracy': float(val_acc),
         'training_config': {
-            'epochs': EPOCHS,
+            'epochs': epochs,
             'batch_size': BATCH_SIZE,
             'focal_loss': USE_FOCAL_LOSS,
             'attention': USE_ATTENTION,
@@ -1021,7 +2965,9 @@ def save_config(val_acc):
         'model_files': {
             'h5': OUTPUT_H5,
             'tflite': OUTPUT_MODEL
-        }
+        },
+        'tflite_quantization': quantization,
+        'tflite_export_mode': export_mode
     }
     
     with open(OUTPUT_LABELS, 'w') as f:
@@ -1034,7 +2980,9 @@ def save_config(val_acc):
 # MAIN
 # ============================================================================
 
-def main():
+def main(pipeline=INPUT_PIPELINE, quantization=TFLITE_QUANTIZATION, compare_quantization=False,
+         export_mode=EXPORT_MODE, prune_sparsity=PRUNE_TARGET_SPARSITY if USE_PRUNING else None,
+         qat=USE_QAT, epochs=EPOCHS):
     print("\n" + "=" * 70)
     print("🚀 ADVANCED ISL MODEL TRAINING - MAXIMUM ACCURACY")
     print("=" * 70)
@@ -1062,16 +3010,27 @@ def main():
     model = create_advanced_model(input_size)
     
     # Train
-    history, model, X_val, y_val = train_model(model, X, y, hard_indices)
+    history, model, X_val, y_val = train_model(model, X, y, hard_indices, pipeline=pipeline,
+                                               epochs=epochs)
     
     # Evaluate
     val_acc = evaluate_model(model, X_val, y_val, use_tta=True)
     
-    # Convert to TFLite
-    convert_to_tflite(model)
+    # Convert to TFLite (reuses the training arrays, no second load)
+    train_rows, val_rows = split_rows(y)
+    tflite_model = convert_to_tflite(model, X, y, train_rows, val_rows, quantization=quantization,
+                                     compare_quantization=compare_quantization,
+                                     export_mode=export_mode, prune_sparsity=prune_sparsity,
+                                     qat=qat)
+    
+    # Confused-pairs check on the int8 artifact that actually ships
+    if qat and tflite_model is not None:
+        evaluate_model(tf.lite.Interpreter(model_content=tflite_model), X_val, y_val,
+                       use_tta=False, title="EVALUATION (QAT INT8 TFLITE)")
+        quantization = 'int8'
     
     # Save config
-    save_config(val_acc)
+    save_config(val_acc, quantization, export_mode, epochs)
     
     # Final summary
     print("\n" + "=" * 70)
@@ -1090,4 +3049,57 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Train the advanced ISL model')
+    parser.add_argument('--benchmark-augmenter', action='store_true',
+                        help='Benchmark the vectorized augmenter against the loop version')
+    parser.add_argument('--pipeline', choices=['tf.data', 'generator'], default=INPUT_PIPELINE,
+                        help='Training input pipeline')
+    parser.add_argument('--sweep-students', action='store_true',
+                        help=f'Distill and benchmark student candidates from {OUTPUT_H5}')
+    parser.add_argument('--latency-budget', type=float, default=LATENCY_BUDGET_MS,
+                        help='Single-sample latency budget (ms) for --sweep-students')
+    parser.add_argument('--quantization', choices=QUANTIZATION_MODES, default=TFLITE_QUANTIZATION,
+                        help='TFLite quantization of the exported student')
+    parser.add_argument('--export-mode', choices=['advanced', 'distilled'], default=EXPORT_MODE,
+                        help='Ship the trained model itself or a distilled student')
+    parser.add_argument('--prune', type=float, nargs='?', const=PRUNE_TARGET_SPARSITY,
+                        default=PRUNE_TARGET_SPARSITY if USE_PRUNING else None, metavar='SPARSITY',
+                        help=f'Structured neuron pruning before export (default {PRUNE_TARGET_SPARSITY})')
+    parser.add_argument('--qat', action='store_true', default=USE_QAT,
+                        help='Quantization-aware fine-tuning and int8 export')
+    parser.add_argument('--cv', type=int, metavar='K',
+                        help='Run stratified K-fold cross-validation instead of a single split')
+    parser.add_argument('--cv-workers', type=int, default=None,
+                        help='Parallel fold workers (default: min(K, cores))')
+    parser.add_argument('--epochs', type=int, default=EPOCHS,
+                        help='Training epochs (single run and each --cv fold)')
+    parser.add_argument('--search', type=int, metavar='N',
+                        help='Run a parallel hyperparameter search with N trials (resumable)')
+    parser.add_argument('--search-space', type=str,
+                        help='JSON file with a search space (default: SEARCH_SPACE)')
+    parser.add_argument('--search-workers', type=int, default=None,
+                        help='Parallel trial workers (default: min(N, cores))')
+    parser.add_argument('--compare-quantization', action='store_true',
+                        help='Report accuracy/latency of every quantization mode against float16')
+    
+    args = parser.parse_args()
+    
+    if args.benchmark_augmenter:
+        benchmark_augmenter()
+    elif args.cv:
+        cross_validate(args.cv, workers=args.cv_workers, epochs=args.epochs, pipeline=args.pipeline)
+    elif args.search:
+        space = None
+        if args.search_space:
+            with open(args.search_space) as f:
+                space = json.load(f)
+        hyperparameter_search(args.search, workers=args.search_workers, space=space,
+                              pipeline=args.pipeline)
+    elif args.sweep_students:
+        run_student_sweep(latency_budget_ms=args.latency_budget, quantization=args.quantization)
+    else:
+        main(pipeline=args.pipeline, quantization=args.quantization,
+             compare_quantization=args.compare_quantization, export_mode=args.export_mode,
+             prune_sparsity=args.prune, qat=args.qat, epochs=args.epochs)